@@ -0,0 +1,479 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from utils import load_settings, stop_event, account_index
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+DEFAULT_API_URL = "http://local.adspower.net:50325"
+# Локальный API AdsPower ограничивает частоту запросов; лишние запросы получают ошибку
+DEFAULT_RATE_LIMIT = 2.0  # запросов в секунду
+
+
+class RateLimiter:
+    """
+    Ограничитель частоты запросов (token bucket).
+    Потоки, превысившие лимит, ждут своей очереди, а не получают ошибку от API.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Ждёт разрешения на запрос.
+
+        :return: False, если ожидание прервано stop_event.
+        """
+        if self.rate <= 0:
+            return True
+        # Один поток за раз ждёт токен — остальные стоят в очереди на блокировке
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                if stop_event.wait((1 - self._tokens) / self.rate):
+                    return False
+
+
+class AdsPowerClient:
+    """
+    Общий клиент локального API AdsPower.
+
+    Держит пул keep-alive соединений, задаёт таймауты и повторы для каждого
+    эндпоинта, соблюдает лимит частоты запросов и собирает метрики задержек.
+    """
+    DEFAULT_TIMEOUT = 15
+    ENDPOINT_TIMEOUTS = {
+        "/api/v1/browser/start": 90,
+        "/api/v1/browser/stop": 15,
+        "/api/v1/browser/active": 10,
+        "/api/v1/browser/local-active": 10,
+        "/api/v1/user/list": 20,
+    }
+    # Запросы с побочным эффектом: после таймаута чтения AdsPower мог их уже выполнить,
+    # поэтому они не повторяются (повтор browser/start запустил бы профиль второй раз)
+    NON_IDEMPOTENT = ("/api/v1/browser/start",)
+    MAX_RETRIES = 2
+    RETRY_DELAY = 2
+    # Сколько ждать появления браузера после таймаута browser/start, секунд
+    START_CONFIRM_TIMEOUT = 30
+
+    def __init__(self, base_url=DEFAULT_API_URL, rate_limit=DEFAULT_RATE_LIMIT, pool_size=16):
+        self.base_url = base_url.rstrip("/")
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._metrics = {}
+        self._metrics_lock = threading.Lock()
+
+    def get(self, endpoint, params=None, timeout=None, retries=None):
+        """
+        Выполняет GET-запрос к API и возвращает разобранный JSON.
+        Повторяет запрос при сетевых ошибках и ответе о превышении лимита
+        (эндпоинты из NON_IDEMPOTENT — кроме таймаута чтения).
+
+        :raises requests.exceptions.RequestException: Если все попытки завершились ошибкой.
+        """
+        timeout = timeout or self.ENDPOINT_TIMEOUTS.get(
+            endpoint, self.DEFAULT_TIMEOUT)
+        retries = self.MAX_RETRIES if retries is None else retries
+        url = f"{self.base_url}{endpoint}"
+        attempt = 0
+        while True:
+            if not self.rate_limiter.acquire():
+                raise requests.exceptions.RequestException(
+                    "Stop event set while waiting for AdsPower rate limiter")
+            started_at = time.monotonic()
+            try:
+                response = self.session.get(url, params=params, timeout=timeout)
+                response.raise_for_status()
+                data = response.json()
+                self._record(endpoint, time.monotonic() - started_at)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self._record(endpoint, time.monotonic() - started_at, error=True)
+                if attempt >= retries or stop_event.is_set():
+                    raise
+                if endpoint in self.NON_IDEMPOTENT and isinstance(e, requests.exceptions.ReadTimeout):
+                    raise
+                attempt += 1
+                logger.debug(
+                    f"AdsPower API {endpoint} failed ({e}). Retrying ({attempt}/{retries}).")
+                stop_event.wait(self.RETRY_DELAY * attempt)
+                continue
+            except requests.exceptions.RequestException:
+                self._record(endpoint, time.monotonic() - started_at, error=True)
+                raise
+
+            if self._is_rate_limited(data) and attempt < retries and not stop_event.is_set():
+                attempt += 1
+                logger.debug(
+                    f"AdsPower API {endpoint} rate limited. Retrying ({attempt}/{retries}).")
+                self._record_rate_limited(endpoint)
+                stop_event.wait(self.RETRY_DELAY * attempt)
+                continue
+            return data
+
+    @staticmethod
+    def _is_rate_limited(data):
+        message = str(data.get("msg", "")).lower()
+        return data.get("code") != 0 and "too many request" in message
+
+    # Эндпоинты, используемые скриптом
+
+    def browser_active(self, serial_number):
+        return self.get("/api/v1/browser/active", params={"serial_number": serial_number})
+
+    def browser_start(self, serial_number, headless=0, ip_tab=0):
+        """
+        Запускает браузер профиля. Если AdsPower не ответил вовремя, запуск не повторяется:
+        статус проверяется через browser/active, и при активном браузере возвращается его ответ
+        (те же поля ws и webdriver).
+        """
+        try:
+            return self.get("/api/v1/browser/start", params={
+                "serial_number": serial_number, "ip_tab": ip_tab, "headless": headless})
+        except requests.exceptions.ReadTimeout:
+            logger.debug(
+                f"#{serial_number}: browser/start timed out. Checking whether the browser is running.")
+            deadline = time.monotonic() + self.START_CONFIRM_TIMEOUT
+            while not stop_event.is_set():
+                data = self.browser_active(serial_number)
+                if data.get("code") == 0 and data.get("data", {}).get("status") == "Active":
+                    logger.debug(
+                        f"#{serial_number}: Browser is running despite the start timeout.")
+                    return data
+                if time.monotonic() >= deadline:
+                    break
+                stop_event.wait(self.RETRY_DELAY)
+            raise
+
+    def browser_stop(self, serial_number):
+        return self.get("/api/v1/browser/stop", params={"serial_number": serial_number})
+
+    def browser_local_active(self):
+        return self.get("/api/v1/browser/local-active")
+
+    def user_list(self, page=1, page_size=100, **filters):
+        params = {"page": page, "page_size": page_size}
+        params.update({key: value for key,
+                      value in filters.items() if value is not None})
+        return self.get("/api/v1/user/list", params=params)
+
+    # Метрики
+
+    def _entry(self, endpoint):
+        return self._metrics.setdefault(endpoint, {
+            "requests": 0, "errors": 0, "rate_limited": 0, "total": 0.0, "max": 0.0})
+
+    def _record(self, endpoint, elapsed, error=False):
+        with self._metrics_lock:
+            entry = self._entry(endpoint)
+            entry["requests"] += 1
+            entry["total"] += elapsed
+            entry["max"] = max(entry["max"], elapsed)
+            if error:
+                entry["errors"] += 1
+
+    def _record_rate_limited(self, endpoint):
+        with self._metrics_lock:
+            self._entry(endpoint)["rate_limited"] += 1
+
+    def metrics(self):
+        """
+        Возвращает метрики по эндпоинтам: число запросов, ошибок, среднюю и максимальную задержку (мс).
+        """
+        with self._metrics_lock:
+            return {
+                endpoint: {
+                    "requests": entry["requests"],
+                    "errors": entry["errors"],
+                    "rate_limited": entry["rate_limited"],
+                    "avg_ms": round(entry["total"] / entry["requests"] * 1000, 1) if entry["requests"] else 0.0,
+                    "max_ms": round(entry["max"] * 1000, 1),
+                }
+                for endpoint, entry in self._metrics.items()
+            }
+
+    def close(self):
+        self.session.close()
+
+
+class _BrowserStatus:
+    def __init__(self):
+        self.active = None
+        self.checked_at = 0.0
+        self.ws = None
+        self.webdriver = None
+        self.waiters = 0
+        self.events = {"active": threading.Event(),
+                       "closed": threading.Event()}
+
+
+class BrowserStatusPoller:
+    """
+    Общий фоновый опросчик статуса браузеров AdsPower.
+
+    Вместо того чтобы каждый BrowserManager опрашивал /browser/active для своего
+    профиля, один поток получает список всех активных браузеров за один запрос
+    (/browser/local-active), хранит кэш статусов и выставляет события
+    "active"/"closed" по серийным номерам. Интервал опроса адаптивный: короткий,
+    пока статус меняется, и постепенно растёт, пока изменений нет.
+    Если AdsPower не поддерживает local-active, используется опрос /browser/active
+    для отслеживаемых профилей — но по-прежнему из одного потока.
+    """
+    FAST_INTERVAL = 2
+    SLOW_INTERVAL = 15
+    BACKOFF = 1.5
+    DEFAULT_MAX_AGE = 5
+
+    def __init__(self, client):
+        self.client = client
+        self._statuses = {}
+        self._user_ids = {}
+        self._condition = threading.Condition()
+        self._poll_lock = threading.Lock()
+        self._interval = self.FAST_INTERVAL
+        self._local_active_supported = True
+        self._thread = None
+
+    def _entry(self, serial_number):
+        return self._statuses.setdefault(str(serial_number), _BrowserStatus())
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="browser-status-poller", daemon=True)
+            self._thread.start()
+
+    def is_active(self, serial_number, max_age=DEFAULT_MAX_AGE):
+        """
+        Возвращает True, если браузер профиля активен.
+        Использует кэш, если он не старше max_age секунд, иначе выполняет общий проход опроса.
+        """
+        serial_number = str(serial_number)
+        with self._condition:
+            entry = self._entry(serial_number)
+            fresh = entry.checked_at and time.time() - entry.checked_at <= max_age
+        if not fresh:
+            self.poll_once(extra=[serial_number], max_age=max_age)
+        with self._condition:
+            return bool(self._entry(serial_number).active)
+
+    def info(self, serial_number):
+        """
+        Возвращает данные подключения (ws, webdriver) активного браузера из кэша или None.
+        """
+        with self._condition:
+            entry = self._statuses.get(str(serial_number))
+            if entry and entry.active and entry.ws:
+                return {"ws": entry.ws, "webdriver": entry.webdriver}
+        return None
+
+    def mark(self, serial_number, active, ws=None, webdriver=None):
+        """
+        Обновляет кэш по результату собственных действий (запуск/остановка браузера).
+        """
+        with self._condition:
+            self._apply(str(serial_number), active, ws, webdriver)
+            self._interval = self.FAST_INTERVAL
+            self._condition.notify_all()
+
+    def wait_for(self, serial_number, state, timeout):
+        """
+        Ждёт, пока браузер профиля перейдёт в состояние "active" или "closed".
+        Сам не опрашивает API — ждёт событие от общего опросчика.
+
+        :return: True, если состояние достигнуто; False по тайм-ауту или stop_event.
+        """
+        serial_number = str(serial_number)
+        deadline = time.time() + timeout
+        with self._condition:
+            entry = self._entry(serial_number)
+            entry.waiters += 1
+            self._interval = self.FAST_INTERVAL
+            self._ensure_thread()
+            self._condition.notify_all()
+        try:
+            while not stop_event.is_set():
+                if entry.events[state].wait(min(1, max(0, deadline - time.time()))):
+                    return True
+                if time.time() >= deadline:
+                    return False
+            return False
+        finally:
+            with self._condition:
+                entry.waiters -= 1
+
+    def poll_once(self, extra=(), max_age=0):
+        """
+        Один проход опроса для всех отслеживаемых профилей (и профилей из extra).
+        Одновременные вызовы объединяются: если проход завершился, пока вызывающий
+        ждал блокировку, повторный запрос не выполняется.
+        """
+        requested_at = time.time()
+        with self._poll_lock:
+            with self._condition:
+                serials = {serial for serial, entry in self._statuses.items()
+                           if entry.waiters > 0}
+                serials.update(str(serial) for serial in extra)
+                if all(self._statuses.get(serial) and
+                       self._statuses[serial].checked_at >= requested_at - max_age
+                       for serial in extra) and extra:
+                    return
+            if not serials:
+                return
+            try:
+                changed = self._poll(serials)
+            except requests.exceptions.RequestException as e:
+                logger.debug(f"Browser status poll failed: {e}")
+                return
+            with self._condition:
+                if changed:
+                    self._interval = self.FAST_INTERVAL
+                else:
+                    self._interval = min(
+                        self.SLOW_INTERVAL, self._interval * self.BACKOFF)
+
+    def _poll(self, serials):
+        if self._local_active_supported:
+            data = self.client.browser_local_active()
+            if data.get("code") == 0:
+                active = {}
+                for browser in data.get("data", {}).get("list", []) or []:
+                    active[str(browser.get("user_id"))] = browser
+                changed = False
+                unresolved = []
+                for serial in serials:
+                    user_id = self._resolve_user_id(serial)
+                    if user_id is None:
+                        unresolved.append(serial)
+                        continue
+                    browser = active.get(user_id)
+                    with self._condition:
+                        changed |= self._apply(
+                            serial, browser is not None,
+                            (browser or {}).get("ws", {}).get("selenium"),
+                            (browser or {}).get("webdriver"))
+                for serial in unresolved:
+                    changed |= self._poll_single(serial)
+                return changed
+            logger.debug(
+                f"local-active is not available ({data.get('msg')}). Falling back to per-profile status.")
+            self._local_active_supported = False
+
+        changed = False
+        for serial in serials:
+            changed |= self._poll_single(serial)
+        return changed
+
+    def _poll_single(self, serial):
+        data = self.client.browser_active(serial)
+        is_active = data.get("code") == 0 and data.get(
+            "data", {}).get("status") == "Active"
+        ws = data.get("data", {}).get("ws", {}).get("selenium") if is_active else None
+        webdriver = data.get("data", {}).get("webdriver") if is_active else None
+        with self._condition:
+            return self._apply(serial, is_active, ws, webdriver)
+
+    def _resolve_user_id(self, serial):
+        if serial in self._user_ids:
+            return self._user_ids[serial]
+        profile = account_index.profile(serial)
+        user_id = profile.get("user_id") if profile else None
+        if user_id is None:
+            try:
+                data = self.client.user_list(serial_number=serial, page_size=1)
+                profiles = data.get("data", {}).get("list", []) if data.get("code") == 0 else []
+                user_id = profiles[0].get("user_id") if profiles else None
+            except requests.exceptions.RequestException as e:
+                logger.debug(f"#{serial}: Failed to resolve AdsPower user_id: {e}")
+                return None
+        if user_id is not None:
+            self._user_ids[serial] = str(user_id)
+            return str(user_id)
+        return None
+
+    def _apply(self, serial, active, ws=None, webdriver=None):
+        # Вызывается под self._condition
+        entry = self._entry(serial)
+        changed = entry.active != active
+        entry.active = active
+        entry.checked_at = time.time()
+        entry.ws = ws if active else None
+        entry.webdriver = webdriver if active else None
+        if active:
+            entry.events["closed"].clear()
+            entry.events["active"].set()
+        else:
+            entry.events["active"].clear()
+            entry.events["closed"].set()
+        return changed
+
+    def _run(self):
+        while not stop_event.is_set():
+            with self._condition:
+                has_waiters = any(entry.waiters > 0 for entry in self._statuses.values())
+                if not has_waiters:
+                    # Нечего отслеживать — спим до появления ожидающих
+                    self._condition.wait(self.SLOW_INTERVAL)
+                    continue
+            self.poll_once()
+            with self._condition:
+                self._condition.wait(self._interval)
+
+
+_client = None
+_client_lock = threading.Lock()
+_status_poller = None
+
+
+def get_client():
+    """
+    Возвращает общий экземпляр клиента, настроенный из settings.txt
+    (ADSPOWER_API_URL, ADSPOWER_RATE_LIMIT).
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            settings = load_settings()
+            base_url = settings.get(
+                "ADSPOWER_API_URL", "").strip() or DEFAULT_API_URL
+            try:
+                rate_limit = float(settings.get(
+                    "ADSPOWER_RATE_LIMIT", DEFAULT_RATE_LIMIT) or DEFAULT_RATE_LIMIT)
+            except ValueError:
+                logger.warning(
+                    f"Invalid value for 'ADSPOWER_RATE_LIMIT'. Using {DEFAULT_RATE_LIMIT}.")
+                rate_limit = DEFAULT_RATE_LIMIT
+            _client = AdsPowerClient(base_url, rate_limit)
+            logger.debug(
+                f"AdsPower API client created for {base_url} with rate limit {rate_limit} req/s.")
+        return _client
+
+
+def get_status_poller():
+    """
+    Возвращает общий опросчик статуса браузеров.
+    """
+    global _status_poller
+    client = get_client()
+    with _client_lock:
+        if _status_poller is None:
+            _status_poller = BrowserStatusPoller(client)
+        return _status_poller
@@ -0,0 +1,326 @@
+import base64
+import hashlib
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from utils import load_settings
+import logging
+
+try:
+    import websocket  # Необязательная зависимость (websocket-client): перехват запросов через CDP
+except ImportError:
+    websocket = None
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+DEFAULT_CACHE_DIR = os.path.join("temp", "assets")
+DEFAULT_MAX_MB = 200
+
+# Неизменяемые статические файлы: имя содержит хэш сборки (index-Cw3ZQ5Ys.js,
+# 1234-0a1b2c3d4e5f.js) или лежит в /_next/static/ (Next.js)
+IMMUTABLE_ASSET = re.compile(
+    r"(/_next/static/|[.\-_](?=[A-Za-z0-9_]*\d)[A-Za-z0-9_]{8,}\.(js|mjs|css|woff2?|ttf|otf)$)")
+INTERCEPTED_TYPES = ("Script", "Stylesheet", "Font")
+# Заголовки, которые сохраняются вместе с телом и отдаются из кэша
+KEPT_HEADERS = ("content-type", "access-control-allow-origin", "timing-allow-origin")
+
+
+def is_immutable_asset(url):
+    parts = urlsplit(url)
+    return parts.scheme in ("http", "https") and bool(IMMUTABLE_ASSET.search(parts.path))
+
+
+class AssetCache:
+    """
+    Общий для всех профилей дисковый кэш статических файлов с адресацией по содержимому.
+
+    Тело хранится один раз под своим SHA-256 (одинаковые бандлы с разных адресов
+    не дублируются), индекс url -> хэш лежит в index.json. Общий размер ограничен:
+    при превышении удаляются давно не использованные записи (LRU).
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(directory, "index.json")
+        self._lock = threading.Lock()
+        self._index = self._load_index()  # url -> {sha, size, headers, used}
+        self._dirty = False
+        self._stats = {"hits": 0, "misses": 0, "stored": 0, "evicted": 0, "bytes_saved": 0}
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            return index if isinstance(index, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (json.JSONDecodeError, OSError) as e:
+            logger.debug(f"Failed to read asset cache index: {e}")
+            return {}
+
+    def _blob_path(self, sha):
+        return os.path.join(self.directory, sha[:2], sha)
+
+    def get(self, url):
+        """
+        :return: (тело, заголовки) или None.
+        """
+        with self._lock:
+            entry = self._index.get(url)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            try:
+                with open(self._blob_path(entry["sha"]), "rb") as f:
+                    body = f.read()
+            except OSError:
+                # Файл удалён вручную — забываем запись
+                del self._index[url]
+                self._dirty = True
+                self._stats["misses"] += 1
+                return None
+            entry["used"] = time.time()
+            self._dirty = True
+            self._stats["hits"] += 1
+            self._stats["bytes_saved"] += len(body)
+            return body, entry["headers"]
+
+    def put(self, url, body, headers):
+        if len(body) > self.max_bytes // 4:
+            return
+        sha = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(sha)
+        with self._lock:
+            try:
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    temp_path = path + ".tmp"
+                    with open(temp_path, "wb") as f:
+                        f.write(body)
+                    os.replace(temp_path, path)
+            except OSError as e:
+                logger.debug(f"Failed to store asset {url}: {e}")
+                return
+            self._index[url] = {"sha": sha, "size": len(body),
+                                "headers": headers, "used": time.time()}
+            self._dirty = True
+            self._stats["stored"] += 1
+            self._evict()
+
+    def _evict(self):
+        """
+        Удаляет давно не использованные записи, пока размер превышает лимит.
+        Размер считается по уникальным телам.
+        """
+        sizes = {entry["sha"]: entry["size"] for entry in self._index.values()}
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+        for url, entry in sorted(self._index.items(), key=lambda item: item[1]["used"]):
+            if total <= self.max_bytes:
+                break
+            del self._index[url]
+            self._stats["evicted"] += 1
+            sha = entry["sha"]
+            if not any(other["sha"] == sha for other in self._index.values()):
+                total -= entry["size"]
+                try:
+                    os.remove(self._blob_path(sha))
+                except OSError:
+                    pass
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                temp_path = self.index_path + ".tmp"
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._index, f)
+                os.replace(temp_path, self.index_path)
+                self._dirty = False
+            except OSError as e:
+                logger.debug(f"Failed to write asset cache index: {e}")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._index)
+            stats["size_mb"] = round(
+                sum({e["sha"]: e["size"] for e in self._index.values()}.values()) / 1024 / 1024, 1)
+        requests_total = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / requests_total, 2) if requests_total else 0.0
+        stats["mb_saved"] = round(stats.pop("bytes_saved") / 1024 / 1024, 1)
+        return stats
+
+
+class AssetInterceptor:
+    """
+    Перехватывает запросы скриптов, стилей и шрифтов вкладки через CDP Fetch
+    (отдельное соединение DevTools) и отдаёт неизменяемые файлы из AssetCache.
+    Промахи загружаются из сети как обычно и сохраняются в кэш.
+    """
+    WORKERS = 4
+    COMMAND_TIMEOUT = 10
+
+    def __init__(self, cache, ws_url, label=""):
+        self.cache = cache
+        self.ws_url = ws_url
+        self.label = label
+        self._ws = None
+        self._ids = itertools.count(1)
+        self._send_lock = threading.Lock()
+        self._pending = {}  # id -> [Event, result]
+        self._executor = None
+        self._thread = None
+        self.running = False
+
+    def start(self):
+        self._ws = websocket.create_connection(
+            self.ws_url, timeout=self.COMMAND_TIMEOUT, suppress_origin=True)
+        self._ws.settimeout(None)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.WORKERS, thread_name_prefix="asset-cache")
+        self.running = True
+        self._thread = threading.Thread(
+            target=self._read_loop, name=f"asset-cdp-{self.label}", daemon=True)
+        self._thread.start()
+        self._send("Fetch.enable", {"patterns": [
+            {"urlPattern": "*", "resourceType": resource_type, "requestStage": "Request"}
+            for resource_type in INTERCEPTED_TYPES
+        ]}, wait=False)
+
+    def stop(self):
+        self.running = False
+        try:
+            if self._ws:
+                self._ws.close()
+        except Exception:
+            pass
+        if self._executor:
+            self._executor.shutdown(wait=False)
+        self.cache.save()
+
+    def _send(self, method, params, wait=True):
+        message_id = next(self._ids)
+        slot = [threading.Event(), None]
+        if wait:
+            self._pending[message_id] = slot
+        with self._send_lock:
+            self._ws.send(json.dumps({"id": message_id, "method": method, "params": params}))
+        if not wait:
+            return None
+        if not slot[0].wait(self.COMMAND_TIMEOUT):
+            self._pending.pop(message_id, None)
+            return None
+        return slot[1]
+
+    def _read_loop(self):
+        while self.running:
+            try:
+                message = json.loads(self._ws.recv())
+            except Exception:
+                # Браузер закрыт или соединение разорвано
+                break
+            if "id" in message:
+                slot = self._pending.pop(message["id"], None)
+                if slot:
+                    slot[1] = message.get("result")
+                    slot[0].set()
+            elif message.get("method") == "Fetch.requestPaused":
+                self._executor.submit(self._on_paused, message.get("params", {}))
+        self.running = False
+        self.cache.save()
+
+    def _on_paused(self, params):
+        request_id = params.get("requestId")
+        url = params.get("request", {}).get("url", "")
+        try:
+            if "responseStatusCode" in params:
+                self._store_response(params, url)
+                self._send("Fetch.continueRequest", {"requestId": request_id}, wait=False)
+                return
+            if not is_immutable_asset(url):
+                self._send("Fetch.continueRequest", {"requestId": request_id}, wait=False)
+                return
+            cached = self.cache.get(url)
+            if cached:
+                body, headers = cached
+                self._send("Fetch.fulfillRequest", {
+                    "requestId": request_id,
+                    "responseCode": 200,
+                    "responseHeaders": [{"name": name, "value": value} for name, value in headers.items()],
+                    "body": base64.b64encode(body).decode("ascii"),
+                }, wait=False)
+                return
+            # Промах — пропускаем запрос и перехватываем ответ, чтобы сохранить тело
+            self._send("Fetch.continueRequest",
+                       {"requestId": request_id, "interceptResponse": True}, wait=False)
+        except Exception as e:
+            logger.debug(f"Asset interception error for {url}: {e}")
+
+    def _store_response(self, params, url):
+        if params.get("responseStatusCode") != 200:
+            return
+        result = self._send("Fetch.getResponseBody", {"requestId": params.get("requestId")})
+        if not result:
+            return
+        body = result.get("body") or ""
+        body = base64.b64decode(body) if result.get("base64Encoded") else body.encode("utf-8")
+        headers = {
+            header.get("name"): header.get("value")
+            for header in params.get("responseHeaders", [])
+            if str(header.get("name", "")).lower() in KEPT_HEADERS
+        }
+        self.cache.put(url, body, headers)
+
+
+def page_websocket_url(debugger_address, target_id=None):
+    """
+    Адрес DevTools-соединения вкладки (target_id — дескриптор окна WebDriver), иначе первой вкладки.
+    """
+    targets = requests.get(f"http://{debugger_address}/json", timeout=5).json()
+    pages = [target for target in targets if target.get("type") == "page"]
+    for target in pages:
+        if target_id and target.get("id") == target_id:
+            return target.get("webSocketDebuggerUrl")
+    return pages[0].get("webSocketDebuggerUrl") if pages else None
+
+
+_asset_cache = None
+_asset_cache_lock = threading.Lock()
+
+
+def get_asset_cache():
+    """
+    Возвращает общий кэш статических файлов или None, если он выключен (ASSET_CACHE)
+    или не установлен websocket-client.
+    """
+    global _asset_cache
+    with _asset_cache_lock:
+        if _asset_cache is None:
+            settings = load_settings()
+            if settings.get("ASSET_CACHE", "false").strip().lower() != "true":
+                _asset_cache = False
+            elif websocket is None:
+                logger.warning(
+                    "ASSET_CACHE requires the websocket-client package (pip install websocket-client). Asset cache disabled.")
+                _asset_cache = False
+            else:
+                try:
+                    max_mb = int(settings.get("ASSET_CACHE_MAX_MB", DEFAULT_MAX_MB) or DEFAULT_MAX_MB)
+                except ValueError:
+                    logger.warning(
+                        f"Invalid value for 'ASSET_CACHE_MAX_MB'. Using {DEFAULT_MAX_MB}.")
+                    max_mb = DEFAULT_MAX_MB
+                _asset_cache = AssetCache(max_bytes=max_mb * 1024 * 1024)
+        return _asset_cache or None
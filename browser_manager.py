@@ -1,15 +1,24 @@
 import requests
-import time
+import threading
 from selenium import webdriver
 from requests.exceptions import RequestException
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import WebDriverException
 import traceback
-from utils import visible, stop_event
+from datetime import datetime
+from utils import visible, stop_event, load_settings
+from adspower_client import get_client, get_status_poller
+from network_capture import LOGGING_PREFS, capture_enabled
+from asset_cache import AssetInterceptor, get_asset_cache, page_websocket_url
 from colorama import Fore, Style
 import logging
 
+try:
+    import psutil  # Необязательная зависимость: контроль памяти для пула браузеров
+except ImportError:
+    psutil = None
+
 # Настройка логирования
 logger = logging.getLogger("application_logger")
 
@@ -21,27 +30,18 @@ class BrowserManager:
         self.serial_number = serial_number
         self.driver = None
         self.headless_mode = 0 if visible.is_set() else 1
+        self.api = get_client()
+        self.status_poller = get_status_poller()
+        self.asset_interceptor = None
 
     def check_browser_status(self):
         """
-        Проверяет статус активности браузера через API AdsPower.
+        Проверяет статус активности браузера через общий опросчик статусов AdsPower.
         """
         try:
             logger.debug(
-                f"#{self.serial_number}: Checking browser status via API.")
-            response = requests.get(
-                'http://local.adspower.net:50325/api/v1/browser/active',
-                params={'serial_number': self.serial_number}
-            )
-            logger.debug(
-                f"#{self.serial_number}: API request sent to check browser status.")
-
-            response.raise_for_status()
-            data = response.json()
-            logger.debug(
-                f"#{self.serial_number}: API response received: {data}")
-
-            if data.get('code') == 0 and data.get('data', {}).get('status') == 'Active':
+                f"#{self.serial_number}: Checking browser status via shared poller.")
+            if self.status_poller.is_active(self.serial_number):
                 logger.debug(f"#{self.serial_number}: Browser is active.")
                 return True
             else:
@@ -75,22 +75,15 @@ class BrowserManager:
 
             logger.debug(f"#{self.serial_number}: Browser is active. Waiting for closure.")
             timeout = 900  # Тайм-аут на 15 минут
-            start_time = time.time()
 
-            while time.time() - start_time < timeout:
-                if stop_event.is_set():
-                    logger.debug(f"#{self.serial_number}: Stop event detected. Exiting wait.")
-                    return False
-
-                try:
-                    if not self.check_browser_status():
-                        logger.debug(f"#{self.serial_number}: Browser successfully closed.")
-                        return True
-                except Exception as e:
-                    logger.debug(f"#{self.serial_number}: Error checking browser status: {str(e)}")
+            # Статус отслеживает общий опросчик — здесь только ждём его событие
+            if self.status_poller.wait_for(self.serial_number, "closed", timeout):
+                logger.debug(f"#{self.serial_number}: Browser successfully closed.")
+                return True
 
-                # Используем короткий sleep с проверкой stop_event
-                stop_event.wait(5)
+            if stop_event.is_set():
+                logger.debug(f"#{self.serial_number}: Stop event detected. Exiting wait.")
+                return False
 
             logger.debug(f"#{self.serial_number}: Waiting time for browser closure expired.")
             return False
@@ -103,6 +96,63 @@ class BrowserManager:
             return False
 
 
+    def connect_driver(self, selenium_address, webdriver_path):
+        """
+        Подключает Selenium WebDriver к запущенному браузеру по debuggerAddress.
+        """
+        # Настройка ChromeOptions
+        chrome_options = Options()
+        chrome_options.add_argument("--disable-notifications")
+        chrome_options.add_argument("--disable-popup-blocking")
+        chrome_options.add_argument("--disable-geolocation")
+        chrome_options.add_argument("--disable-translate")
+        chrome_options.add_argument("--disable-infobars")
+        chrome_options.add_argument(
+            "--disable-blink-features=AutomationControlled")
+        chrome_options.add_argument("--no-sandbox")
+        chrome_options.add_argument(
+            "--disable-background-timer-throttling")
+        chrome_options.add_experimental_option(
+            "debuggerAddress", selenium_address)
+        # Журнал производительности для перехвата ответов API мини-приложения
+        if capture_enabled():
+            chrome_options.set_capability("goog:loggingPrefs", LOGGING_PREFS)
+
+        # Инициализация WebDriver
+        service = Service(executable_path=webdriver_path)
+        self.driver = webdriver.Chrome(
+            service=service, options=chrome_options)
+        self.driver.set_window_size(600, 720)
+        self.browser_closed = False
+
+    def attach_to_running(self):
+        """
+        Подключается к уже открытому браузеру профиля вместо его перезапуска.
+
+        :return: True, если подключение удалось.
+        """
+        try:
+            if not self.check_browser_status():
+                return False
+            info = self.status_poller.info(self.serial_number)
+            if not info:
+                data = self.api.browser_active(self.serial_number)
+                if data.get('code') != 0:
+                    return False
+                info = {"ws": data['data']['ws']['selenium'],
+                        "webdriver": data['data']['webdriver']}
+            logger.debug(
+                f"#{self.serial_number}: Reattaching to running browser at {info['ws']}.")
+            self.connect_driver(info['ws'], info['webdriver'])
+            logger.info(
+                f"#{self.serial_number}: Reattached to the already open browser.")
+            return True
+        except (requests.exceptions.RequestException, WebDriverException, KeyError) as e:
+            logger.debug(
+                f"#{self.serial_number}: Failed to reattach to running browser: {str(e)}")
+            self.driver = None
+            return False
+
     def start_browser(self):
         """
         Запускает браузер через AdsPower API и настраивает Selenium WebDriver.
@@ -119,18 +169,11 @@ class BrowserManager:
                     self.close_browser()
                     stop_event.wait(5)
 
-                # Формирование URL для запуска браузера
-                request_url = (
-                    f'http://local.adspower.net:50325/api/v1/browser/start?'
-                    f'serial_number={self.serial_number}&ip_tab=0&headless={self.headless_mode}'
-                )
+                # Запрос к API на запуск браузера
                 logger.debug(
-                    f"#{self.serial_number}: Request URL for starting browser: {request_url}")
-
-                # Выполнение запроса к API
-                response = requests.get(request_url)
-                response.raise_for_status()
-                data = response.json()
+                    f"#{self.serial_number}: Requesting browser start (headless={self.headless_mode}).")
+                data = self.api.browser_start(
+                    self.serial_number, headless=self.headless_mode)
                 logger.debug(f"#{self.serial_number}: API response: {data}")
 
                 if data['code'] == 0:
@@ -138,27 +181,10 @@ class BrowserManager:
                     webdriver_path = data['data']['webdriver']
                     logger.debug(
                         f"#{self.serial_number}: Selenium address: {selenium_address}, WebDriver path: {webdriver_path}")
+                    self.status_poller.mark(
+                        self.serial_number, True, selenium_address, webdriver_path)
 
-                    # Настройка ChromeOptions
-                    chrome_options = Options()
-                    chrome_options.add_argument("--disable-notifications")
-                    chrome_options.add_argument("--disable-popup-blocking")
-                    chrome_options.add_argument("--disable-geolocation")
-                    chrome_options.add_argument("--disable-translate")
-                    chrome_options.add_argument("--disable-infobars")
-                    chrome_options.add_argument(
-                        "--disable-blink-features=AutomationControlled")
-                    chrome_options.add_argument("--no-sandbox")
-                    chrome_options.add_argument(
-                        "--disable-background-timer-throttling")
-                    chrome_options.add_experimental_option(
-                        "debuggerAddress", selenium_address)
-
-                    # Инициализация WebDriver
-                    service = Service(executable_path=webdriver_path)
-                    self.driver = webdriver.Chrome(
-                        service=service, options=chrome_options)
-                    self.driver.set_window_size(600, 720)
+                    self.connect_driver(selenium_address, webdriver_path)
                     logger.info(
                         f"#{self.serial_number}: Browser started successfully.")
                     return True
@@ -188,6 +214,36 @@ class BrowserManager:
             f"#{self.serial_number}: Failed to start browser after {self.MAX_RETRIES} retries.")
         return False
 
+    def start_asset_cache(self):
+        """
+        Подключает общий кэш статических файлов (ASSET_CACHE) к текущей вкладке через CDP.
+        """
+        cache = get_asset_cache()
+        if cache is None or self.driver is None:
+            return False
+        if self.asset_interceptor and self.asset_interceptor.running:
+            return True
+        try:
+            address = self.driver.capabilities.get(
+                "goog:chromeOptions", {}).get("debuggerAddress")
+            ws_url = page_websocket_url(address, self.driver.current_window_handle)
+            if not ws_url:
+                return False
+            interceptor = AssetInterceptor(cache, ws_url, self.serial_number)
+            interceptor.start()
+        except Exception as e:
+            logger.debug(
+                f"#{self.serial_number}: Failed to start asset cache: {str(e)}")
+            return False
+        self.asset_interceptor = interceptor
+        logger.debug(f"#{self.serial_number}: Asset cache attached.")
+        return True
+
+    def stop_asset_cache(self):
+        if self.asset_interceptor:
+            self.asset_interceptor.stop()
+            self.asset_interceptor = None
+
     def close_browser(self):
         """
         Закрывает браузер с использованием WebDriver как основного способа и API как резервного.
@@ -202,6 +258,7 @@ class BrowserManager:
             return False
 
         self.browser_closed = True  # Устанавливаем флаг перед попыткой закрытия
+        self.stop_asset_cache()
 
         # Попытка закрыть браузер через WebDriver
         if not stop_event.is_set():
@@ -226,19 +283,14 @@ class BrowserManager:
         try:
             logger.debug(
                 f"#{self.serial_number}: Attempting to stop browser via API as fallback.")
-            response = requests.get(
-                'http://local.adspower.net:50325/api/v1/browser/stop',
-                params={'serial_number': self.serial_number},
-                timeout=10
-            )
-            response.raise_for_status()
-            data = response.json()
+            data = self.api.browser_stop(self.serial_number)
             logger.debug(
                 f"#{self.serial_number}: API response for browser stop: {data}")
 
             if data.get('code') == 0:
                 logger.debug(
                     f"#{self.serial_number}: Browser stopped successfully via API.")
+                self.status_poller.mark(self.serial_number, False)
                 return True
             else:
                 logger.warning(
@@ -253,3 +305,184 @@ class BrowserManager:
         logger.error(
             f"#{self.serial_number}: Browser closure process completed with errors.")
         return False
+
+
+class BrowserSessionPool:
+    """
+    Пул открытых браузеров для повторного использования между близкими запусками профиля.
+
+    После обработки аккаунта браузер не закрывается, если следующий запуск этого
+    профиля ожидается в пределах горизонта (BROWSER_KEEP_ALIVE_HORIZON), — следующий
+    запуск подключится к нему без холодного старта AdsPower. Фоновый поток закрывает
+    браузеры, чей запуск так и не наступил, и освобождает пул при нехватке памяти
+    (по числу открытых браузеров и, если установлен psutil, по загрузке памяти).
+    """
+    JANITOR_INTERVAL = 15
+    # Сколько ждать запланированного запуска сверх его времени, прежде чем закрыть браузер
+    GRACE_PERIOD = 120
+
+    def __init__(self, enabled=False, horizon=300, max_open=3, max_memory_percent=85):
+        self.enabled = enabled
+        self.horizon = horizon
+        self.max_open = max_open
+        self.max_memory_percent = max_memory_percent
+        self._sessions = {}  # serial -> (manager, next_due)
+        self._lock = threading.Lock()
+        self._janitor = None
+        self._reused = 0
+        self._kept = 0
+        self._evicted = 0
+
+    def checkout(self, serial_number):
+        """
+        Забирает из пула открытый браузер профиля.
+
+        :return: BrowserManager с живым драйвером или None.
+        """
+        with self._lock:
+            entry = self._sessions.pop(str(serial_number), None)
+        if entry is None:
+            return None
+        manager, _ = entry
+        try:
+            # Проверяем, что сессия WebDriver ещё жива
+            manager.driver.current_window_handle
+        except Exception as e:
+            logger.debug(
+                f"#{serial_number}: Pooled browser session is no longer usable: {str(e).splitlines()[0] if str(e) else e}")
+            self._close(manager)
+            return None
+        with self._lock:
+            self._reused += 1
+        logger.debug(f"#{serial_number}: Reusing kept-alive browser session.")
+        return manager
+
+    def release(self, manager, next_due=None):
+        """
+        Возвращает браузер после обработки: оставляет открытым, если следующий запуск
+        близко, иначе закрывает.
+
+        :param next_due: datetime следующего запуска профиля или None.
+        """
+        if not self._should_keep(manager, next_due):
+            self._close(manager)
+            return False
+        with self._lock:
+            self._sessions[str(manager.serial_number)] = (manager, next_due)
+            self._kept += 1
+            self._ensure_janitor()
+        logger.debug(
+            f"#{manager.serial_number}: Keeping browser open until the next run at {next_due.strftime('%Y-%m-%d %H:%M:%S')}.")
+        self._enforce_limits()
+        return True
+
+    def _should_keep(self, manager, next_due):
+        if not self.enabled or next_due is None or stop_event.is_set():
+            return False
+        if manager.driver is None or getattr(manager, "browser_closed", False):
+            return False
+        return (next_due - datetime.now()).total_seconds() <= self.horizon
+
+    def _memory_pressure(self):
+        if psutil is None or not self.max_memory_percent:
+            return False
+        try:
+            return psutil.virtual_memory().percent >= self.max_memory_percent
+        except Exception:
+            return False
+
+    def _enforce_limits(self):
+        # Освобождаем браузеры с самым поздним следующим запуском
+        while True:
+            with self._lock:
+                if not self._sessions:
+                    return
+                over_limit = len(self._sessions) > self.max_open
+                if not over_limit and not self._memory_pressure():
+                    return
+                serial = max(self._sessions, key=lambda key: self._sessions[key][1])
+                manager, _ = self._sessions.pop(serial)
+                self._evicted += 1
+            logger.debug(
+                f"#{serial}: Releasing kept-alive browser ({'pool limit' if over_limit else 'memory pressure'}).")
+            self._close(manager)
+
+    def _ensure_janitor(self):
+        # Вызывается под self._lock
+        if self._janitor is None or not self._janitor.is_alive():
+            self._janitor = threading.Thread(
+                target=self._run_janitor, name="browser-pool-janitor", daemon=True)
+            self._janitor.start()
+
+    def _run_janitor(self):
+        while not stop_event.wait(self.JANITOR_INTERVAL):
+            now = datetime.now()
+            with self._lock:
+                expired = [serial for serial, (_, next_due) in self._sessions.items()
+                           if (now - next_due).total_seconds() > self.GRACE_PERIOD]
+                managers = [self._sessions.pop(serial)[0] for serial in expired]
+                self._evicted += len(managers)
+            for manager in managers:
+                logger.debug(
+                    f"#{manager.serial_number}: Kept-alive browser was not reused in time. Closing.")
+                self._close(manager)
+            self._enforce_limits()
+
+    @staticmethod
+    def _close(manager):
+        try:
+            manager.close_browser()
+        except Exception as e:
+            logger.debug(
+                f"#{manager.serial_number}: Failed to close pooled browser: {str(e)}")
+
+    def close_all(self):
+        """
+        Закрывает все браузеры пула (при завершении работы).
+        """
+        with self._lock:
+            managers = [manager for manager, _ in self._sessions.values()]
+            self._sessions.clear()
+        for manager in managers:
+            self._close(manager)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "open": len(self._sessions),
+                "kept": self._kept,
+                "reused": self._reused,
+                "evicted": self._evicted,
+            }
+
+
+_session_pool = None
+_session_pool_lock = threading.Lock()
+
+
+def get_session_pool():
+    """
+    Возвращает общий пул браузеров, настроенный из settings.txt
+    (BROWSER_REUSE, BROWSER_KEEP_ALIVE_HORIZON, BROWSER_POOL_MAX_OPEN, BROWSER_POOL_MAX_MEMORY_PERCENT).
+    """
+    global _session_pool
+    with _session_pool_lock:
+        if _session_pool is None:
+            settings = load_settings()
+
+            def int_setting(name, default):
+                value = settings.get(name, "").strip()
+                if value.isdigit():
+                    return int(value)
+                if value:
+                    logger.warning(
+                        f"Invalid value for '{name}': {value}. Using {default}.")
+                return default
+
+            _session_pool = BrowserSessionPool(
+                enabled=settings.get("BROWSER_REUSE", "false").strip().lower() == "true",
+                horizon=int_setting("BROWSER_KEEP_ALIVE_HORIZON", 300),
+                max_open=max(1, int_setting("BROWSER_POOL_MAX_OPEN", 3)),
+                max_memory_percent=int_setting("BROWSER_POOL_MAX_MEMORY_PERCENT", 85),
+            )
+        return _session_pool
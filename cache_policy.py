@@ -0,0 +1,140 @@
+import threading
+from datetime import datetime
+from state_store import get_state_store
+from utils import load_settings
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+DEFAULT_CLEAR_EVERY_RUNS = 10
+DEFAULT_CLEAR_MAX_AGE = 24 * 60 * 60  # секунд
+
+
+class TelegramWebError(Exception):
+    """
+    Telegram Web не загрузился. Только такие сбои указывают на устаревшее состояние
+    страницы, после которого кэш очищается (mark_stale).
+    """
+
+
+class CachePolicy:
+    """
+    Решает, нужно ли очищать кэш браузера и IndexedDB Telegram Web перед запуском.
+
+    Очистка заставляет Telegram Web заново синхронизировать чаты — это самая долгая
+    загрузка за весь запуск, поэтому кэш очищается только:
+      - после сбоя, указывающего на устаревшее состояние страницы (mark_stale);
+      - каждые CACHE_CLEAR_EVERY_RUNS запусков (0 — не очищать по счётчику);
+      - если с последней очистки прошло больше CACHE_CLEAR_MAX_AGE секунд (0 — не очищать по возрасту).
+
+    Время загрузки Telegram Web с очисткой (cold) и без неё (warm) сохраняется
+    по аккаунтам, чтобы по нему можно было подобрать параметры.
+    """
+
+    def __init__(self, store, every_runs=DEFAULT_CLEAR_EVERY_RUNS, max_age=DEFAULT_CLEAR_MAX_AGE):
+        self.store = store
+        self.every_runs = every_runs
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+    def _state(self, account):
+        state = self.store.get_cache_state(account)
+        if state is None:
+            # Аккаунт ещё не учитывался — считаем кэш свежим с этого момента
+            state = {"cleared_at": datetime.now(), "runs_since_clear": 0, "stale_reason": None,
+                     "cold_loads": 0, "cold_seconds": 0.0, "warm_loads": 0, "warm_seconds": 0.0}
+        return state
+
+    def check(self, account):
+        """
+        Учитывает очередной запуск и решает, очищать ли кэш.
+
+        :return: Причина очистки или None, если кэш можно оставить.
+        """
+        with self._lock:
+            state = self._state(account)
+            age = (datetime.now() - state["cleared_at"]).total_seconds()
+            if state["stale_reason"]:
+                reason = f"stale state after failure: {state['stale_reason']}"
+            elif self.every_runs > 0 and state["runs_since_clear"] >= self.every_runs:
+                reason = f"{state['runs_since_clear']} runs since last clear"
+            elif self.max_age > 0 and age >= self.max_age:
+                reason = f"last clear {age / 3600:.1f}h ago"
+            else:
+                reason = None
+            if reason is None:
+                state["runs_since_clear"] += 1
+                self.store.set_cache_state(account, state)
+            return reason
+
+    def record_clear(self, account):
+        with self._lock:
+            state = self._state(account)
+            state.update(cleared_at=datetime.now(), runs_since_clear=0, stale_reason=None)
+            self.store.set_cache_state(account, state)
+
+    def mark_stale(self, account, reason):
+        """
+        Запоминает сбой, после которого кэш нужно очистить при следующем запуске.
+        """
+        with self._lock:
+            state = self._state(account)
+            state["stale_reason"] = str(reason)[:200]
+            self.store.set_cache_state(account, state)
+
+    def record_load(self, account, cold, seconds):
+        """
+        Учитывает время загрузки Telegram Web с очищенным (cold) или сохранённым (warm) кэшем.
+        """
+        prefix = "cold" if cold else "warm"
+        with self._lock:
+            state = self._state(account)
+            state[f"{prefix}_loads"] += 1
+            state[f"{prefix}_seconds"] += seconds
+            self.store.set_cache_state(account, state)
+
+    def stats(self):
+        """
+        Среднее время загрузки Telegram Web с очисткой кэша и без неё по всем аккаунтам.
+        """
+        totals = {"cold_loads": 0, "cold_seconds": 0.0, "warm_loads": 0, "warm_seconds": 0.0}
+        for state in self.store.cache_states().values():
+            for key in totals:
+                totals[key] += state[key]
+        return {
+            "cold_loads": totals["cold_loads"],
+            "avg_cold_seconds": round(totals["cold_seconds"] / totals["cold_loads"], 1) if totals["cold_loads"] else None,
+            "warm_loads": totals["warm_loads"],
+            "avg_warm_seconds": round(totals["warm_seconds"] / totals["warm_loads"], 1) if totals["warm_loads"] else None,
+        }
+
+
+_cache_policy = None
+_cache_policy_lock = threading.Lock()
+
+
+def _int_setting(settings, key, default):
+    try:
+        return int(settings.get(key, default) or 0)
+    except ValueError:
+        logger.warning(f"Invalid value for '{key}'. Using {default}.")
+        return default
+
+
+def get_cache_policy():
+    """
+    Возвращает общую политику очистки кэша, настроенную из settings.txt
+    (CACHE_CLEAR_EVERY_RUNS, CACHE_CLEAR_MAX_AGE).
+    """
+    global _cache_policy
+    with _cache_policy_lock:
+        if _cache_policy is None:
+            settings = load_settings()
+            _cache_policy = CachePolicy(
+                get_state_store(),
+                every_runs=_int_setting(
+                    settings, "CACHE_CLEAR_EVERY_RUNS", DEFAULT_CLEAR_EVERY_RUNS),
+                max_age=_int_setting(
+                    settings, "CACHE_CLEAR_MAX_AGE", DEFAULT_CLEAR_MAX_AGE))
+        return _cache_policy
@@ -0,0 +1,122 @@
+import random
+import threading
+import time
+from utils import load_settings, stop_event
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+# Профили скорости: множитель базовой паузы места вызова, случайный разброс (±доля)
+# и минимальная пауза. safe сохраняет исходные паузы скрипта.
+PROFILES = {
+    "safe": {"scale": 1.0, "jitter": 0.1, "min": 0.5},
+    "balanced": {"scale": 0.6, "jitter": 0.15, "min": 0.3},
+    "fast": {"scale": 0.3, "jitter": 0.2, "min": 0.1},
+}
+DEFAULT_PROFILE = "safe"
+
+
+class DelayPolicy:
+    """
+    Единая точка для всех намеренных пауз автоматизации.
+
+    Место вызова задаёт базовую паузу (число или диапазон (min, max) секунд),
+    а профиль (DELAY_PROFILE) масштабирует её. Все паузы учитываются по аккаунтам
+    и шагам, чтобы было видно, сколько времени работы уходит на ожидание.
+    """
+
+    def __init__(self, profile=DEFAULT_PROFILE):
+        profile = (profile or DEFAULT_PROFILE).strip().lower()
+        if profile not in PROFILES:
+            logger.warning(
+                f"Unknown delay profile '{profile}'. Using '{DEFAULT_PROFILE}'.")
+            profile = DEFAULT_PROFILE
+        self.profile = profile
+        self._params = PROFILES[profile]
+        self._lock = threading.Lock()
+        self._accounts = {}  # account -> {step: [count, seconds]}
+
+    def duration(self, base):
+        """
+        Вычисляет длительность паузы для базового значения с учётом профиля.
+
+        :param base: Секунды или диапазон (min, max).
+        """
+        if isinstance(base, (tuple, list)):
+            low, high = base
+            base = random.uniform(low, max(low, high))
+        seconds = base * self._params["scale"]
+        jitter = self._params["jitter"]
+        seconds *= random.uniform(1 - jitter, 1 + jitter)
+        return max(self._params["min"], seconds)
+
+    def sleep(self, account, step, base):
+        """
+        Выполняет паузу с прерыванием по stop_event и учитывает её.
+
+        :param account: Аккаунт, для которого ведётся учёт.
+        :param step: Название шага (например, "send_message.retry").
+        :param base: Базовая пауза в секундах или диапазон (min, max).
+        :return: False, если пауза прервана stop_event.
+        """
+        seconds = self.duration(base)
+        started_at = time.monotonic()
+        interrupted = stop_event.wait(seconds)
+        self._record(account, step, time.monotonic() - started_at)
+        return not interrupted
+
+    def _record(self, account, step, seconds):
+        with self._lock:
+            entry = self._accounts.setdefault(str(account), {}).setdefault(step, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def account_total(self, account):
+        """
+        Суммарное время намеренных пауз аккаунта (в секундах).
+        """
+        with self._lock:
+            return sum(seconds for _, seconds in self._accounts.get(str(account), {}).values())
+
+    def account_stats(self, account):
+        """
+        Паузы аккаунта по шагам: {step: {"count": n, "seconds": s}}, по убыванию времени.
+        """
+        with self._lock:
+            steps = dict(self._accounts.get(str(account), {}))
+        return {
+            step: {"count": count, "seconds": round(seconds, 1)}
+            for step, (count, seconds) in sorted(steps.items(), key=lambda item: -item[1][1])
+        }
+
+    def stats(self):
+        """
+        Общая статистика: профиль, суммарные паузы и паузы по аккаунтам.
+        """
+        with self._lock:
+            per_account = {
+                account: round(sum(seconds for _, seconds in steps.values()), 1)
+                for account, steps in self._accounts.items()
+            }
+        return {
+            "profile": self.profile,
+            "total_seconds": round(sum(per_account.values()), 1),
+            "accounts": per_account,
+        }
+
+
+_delay_policy = None
+_delay_policy_lock = threading.Lock()
+
+
+def get_delay_policy():
+    """
+    Возвращает общую политику пауз, настроенную из settings.txt (DELAY_PROFILE).
+    """
+    global _delay_policy
+    with _delay_policy_lock:
+        if _delay_policy is None:
+            _delay_policy = DelayPolicy(
+                load_settings().get("DELAY_PROFILE", DEFAULT_PROFILE))
+        return _delay_policy
@@ -0,0 +1,156 @@
+from rapidfuzz import fuzz
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+# Один вызов execute_script возвращает описание всех кнопок страницы (текущего фрейма):
+# индекс, видимый текст, outerHTML в нижнем регистре и его хэш, признак disabled,
+# текст награды (если задан селектор) и сам элемент.
+SCAN_BUTTONS_SCRIPT = """
+const selector = arguments[0] || 'button';
+const rewardSelector = arguments[1];
+return Array.from(document.querySelectorAll(selector)).map((el, index) => {
+    const html = el.outerHTML.toLowerCase();
+    let hash = 0;
+    for (let i = 0; i < html.length; i++) {
+        hash = (Math.imul(hash, 31) + html.charCodeAt(i)) | 0;
+    }
+    const rewardEl = rewardSelector ? el.querySelector(rewardSelector) : null;
+    return {
+        index: index,
+        text: (el.innerText || el.textContent || '').trim(),
+        html: html,
+        hash: hash,
+        disabled: !!el.disabled || el.hasAttribute('disabled'),
+        reward: rewardEl ? (rewardEl.innerText || rewardEl.textContent || '').trim() : null,
+        element: el
+    };
+});
+"""
+
+
+class ButtonInfo:
+    """
+    Снимок одной кнопки, полученный за один проход по DOM.
+    """
+    __slots__ = ("index", "text", "html", "hash", "disabled", "reward", "element")
+
+    def __init__(self, index, text, html, hash, disabled, reward, element):
+        self.index = index
+        self.text = text
+        self.html = html
+        self.hash = hash
+        self.disabled = disabled
+        self.reward = reward
+        self.element = element
+
+    def __repr__(self):
+        return f"ButtonInfo(index={self.index}, text={self.text!r}, disabled={self.disabled})"
+
+
+def scan_buttons(driver, selector="button", reward_selector=None):
+    """
+    Возвращает снимок всех кнопок текущего фрейма одним вызовом WebDriver.
+
+    :param selector: CSS-селектор кнопок.
+    :param reward_selector: CSS-селектор блока награды внутри кнопки (необязательно).
+    :return: Список ButtonInfo в порядке документа.
+    """
+    items = driver.execute_script(
+        SCAN_BUTTONS_SCRIPT, selector, reward_selector) or []
+    return [
+        ButtonInfo(
+            index=item.get("index"),
+            text=item.get("text") or "",
+            html=item.get("html") or "",
+            hash=item.get("hash"),
+            disabled=bool(item.get("disabled")),
+            reward=item.get("reward"),
+            element=item.get("element"),
+        )
+        for item in items
+    ]
+
+
+def find_by_keywords(buttons, keywords):
+    """
+    Возвращает первую кнопку, в HTML которой есть любое из ключевых слов, или None.
+    """
+    for button in buttons:
+        if any(keyword in button.html for keyword in keywords):
+            return button
+    return None
+
+
+def find_by_text(buttons, text, threshold=70):
+    """
+    Нечёткий поиск кнопки по тексту (partial_ratio), как в find_button_by_text.
+
+    :return: Лучшая кнопка со схожестью не ниже threshold или None.
+    """
+    text = text.lower()
+    best_match = None
+    best_score = 0
+    for button in buttons:
+        score = fuzz.partial_ratio(button.text.lower(), text)
+        if score > best_score:
+            best_score = score
+            best_match = button
+        # Точное совпадение — дальше можно не искать
+        if score == 100:
+            return button
+    if best_score >= threshold:
+        return best_match
+    return None
+
+
+# Один вызов возвращает имя пользователя, цифры баланса и таймер фарма
+GAME_STATE_SCRIPT = """
+const state = {username: null, balance: null, farm_digits: null};
+const user = document.evaluate('//header/button/p', document, null,
+    XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (user) {
+    state.username = user.textContent.trim();
+}
+const balanceBlock = document.querySelector('.font-tt-hoves-expanded');
+if (balanceBlock) {
+    state.balance = Array.from(balanceBlock.querySelectorAll("span[class*='index-module_num__j6XH3']"))
+        .filter(el => el.getAttribute('aria-hidden') !== 'true')
+        .map(el => el.textContent.trim())
+        .join('');
+}
+const timer = Array.from(document.querySelectorAll('span')).find(el => {
+    const text = (el.innerText || '').trim().toLowerCase();
+    return text.includes('осталось') || text.includes('get after');
+});
+if (timer) {
+    state.farm_digits = Array.from(timer.querySelectorAll('span'))
+        .filter(el => {
+            const hidden = el.getAttribute('aria-hidden');
+            return !hidden || hidden.toLowerCase() === 'false';
+        })
+        .map(el => el.textContent.trim())
+        .filter(text => /^[0-9]$/.test(text))
+        .join('');
+}
+return state;
+"""
+
+
+def probe_game_state(driver):
+    """
+    Читает состояние игры одним вызовом WebDriver (в текущем фрейме).
+
+    :return: Словарь с ключами username, balance (строка без запятых) и
+             farm_time ("HH:MM:SS"); отсутствующие значения — None.
+    """
+    raw = driver.execute_script(GAME_STATE_SCRIPT) or {}
+    username = (raw.get("username") or "").strip() or None
+    balance = (raw.get("balance") or "").replace(",", "") or None
+    if balance is not None and not balance.replace(".", "", 1).isdigit():
+        balance = None
+    digits = raw.get("farm_digits") or ""
+    farm_time = (f"{digits[:2]}:{digits[2:4]}:{digits[4:6]}"
+                 if len(digits) >= 6 else None)
+    return {"username": username, "balance": balance, "farm_time": farm_time}
@@ -0,0 +1,111 @@
+import time
+from selenium.common.exceptions import WebDriverException, TimeoutException
+from utils import stop_event
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+# Асинхронный скрипт: проверяет условие сразу, затем подписывается на изменения DOM
+# через MutationObserver и вызывает callback, как только условие выполнено
+# (или по тайм-ауту). Работает в текущем фрейме драйвера.
+WAIT_SCRIPT = """
+const css = arguments[0];
+const xpath = arguments[1];
+const texts = arguments[2];
+const textSelector = arguments[3] || '*';
+const absent = arguments[4];
+const timeoutMs = arguments[5];
+const done = arguments[arguments.length - 1];
+
+function find() {
+    if (css) {
+        return document.querySelector(css);
+    }
+    if (xpath) {
+        return document.evaluate(xpath, document, null,
+            XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    }
+    if (texts) {
+        for (const el of document.querySelectorAll(textSelector)) {
+            const html = el.outerHTML.toLowerCase();
+            if (texts.some(text => html.includes(text))) {
+                return el;
+            }
+        }
+    }
+    return null;
+}
+
+let finished = false;
+let observer = null;
+let timer = null;
+
+function finish(value) {
+    if (finished) {
+        return;
+    }
+    finished = true;
+    if (observer) {
+        observer.disconnect();
+    }
+    clearTimeout(timer);
+    done(value);
+}
+
+function check() {
+    const el = find();
+    if (absent ? !el : el) {
+        finish(absent ? true : el);
+    }
+}
+
+check();
+if (!finished) {
+    observer = new MutationObserver(check);
+    observer.observe(document.documentElement || document, {
+        childList: true, subtree: true, attributes: true, characterData: true
+    });
+    timer = setTimeout(() => finish(absent ? false : null), timeoutMs);
+}
+"""
+
+# Максимальная длительность одного асинхронного скрипта; между частями проверяется stop_event
+CHUNK_SECONDS = 5
+
+
+def wait_for(driver, css=None, xpath=None, texts=None, text_selector="button",
+             absent=False, timeout=10):
+    """
+    Ждёт появления (или исчезновения при absent=True) элемента без опроса:
+    ожидание разрешается в момент изменения DOM.
+
+    :param css: CSS-селектор элемента.
+    :param xpath: XPath элемента (если css не задан).
+    :param texts: Список подстрок; подходит элемент text_selector, в HTML которого есть любая из них.
+    :param absent: Ждать исчезновения элемента.
+    :return: Элемент (или True при absent=True), либо None/False по тайм-ауту или stop_event.
+    """
+    if texts:
+        texts = [text.lower() for text in texts]
+    deadline = time.time() + timeout
+    while not stop_event.is_set():
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            break
+        chunk = min(CHUNK_SECONDS, remaining)
+        try:
+            driver.set_script_timeout(chunk + 5)
+            result = driver.execute_async_script(
+                WAIT_SCRIPT, css, xpath, texts, text_selector, absent, int(chunk * 1000))
+        except TimeoutException:
+            result = None
+        except WebDriverException as e:
+            # Например, документ перезагрузился во время ожидания — пробуем снова
+            logger.debug(
+                f"DOM wait interrupted: {str(e).splitlines()[0] if str(e) else e}")
+            result = None
+            stop_event.wait(0.5)
+        if result:
+            return result
+    return False if absent else None
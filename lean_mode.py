@@ -0,0 +1,136 @@
+import threading
+from selenium.common.exceptions import WebDriverException
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+# Тяжёлые ресурсы, без которых скрипт работает: картинки, стикеры и медиа.
+# Шрифты не блокируются: они входят в сборку приложения (от них зависит вёрстка,
+# по которой ищутся элементы) и кэшируются ASSET_CACHE.
+# Шаблоны Network.setBlockedURLs, символ * — любая подстрока.
+DEFAULT_BLOCK_PATTERNS = (
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico",
+    "*.tgs", "*.webm", "*.mp4", "*.mp3", "*.ogg",
+)
+
+# Отключает анимации и переходы (в том числе «прокрутку» цифр баланса)
+LEAN_STYLE_SCRIPT = """
+if (!document.getElementById('lean-mode-style')) {
+    const style = document.createElement('style');
+    style.id = 'lean-mode-style';
+    style.textContent = '*, *::before, *::after {'
+        + 'animation: none !important; transition: none !important;'
+        + 'scroll-behavior: auto !important; }';
+    (document.head || document.documentElement).appendChild(style);
+}
+"""
+
+# Объём загруженного документом (и его ресурсами) по Resource Timing, в байтах
+TRANSFER_SIZE_SCRIPT = """
+const entries = performance.getEntriesByType('navigation')
+    .concat(performance.getEntriesByType('resource'));
+return entries.reduce((total, entry) => total + (entry.transferSize || 0), 0);
+"""
+
+
+def parse_block_patterns(value):
+    """
+    Строка шаблонов через запятую -> список; пустая строка — шаблоны по умолчанию.
+    """
+    patterns = [pattern.strip() for pattern in (value or "").split(",") if pattern.strip()]
+    return patterns or list(DEFAULT_BLOCK_PATTERNS)
+
+
+def block_urls(driver, patterns):
+    """
+    Блокирует запросы по шаблонам через CDP для текущей вкладки.
+
+    :return: True, если блокировка включена.
+    """
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+        return True
+    except WebDriverException as e:
+        logger.debug(
+            f"Failed to block URLs: {str(e).splitlines()[0] if str(e) else e}")
+        return False
+
+
+def inject_lean_style(driver):
+    """
+    Добавляет в текущий фрейм стиль без анимаций и переходов.
+    """
+    try:
+        driver.execute_script(LEAN_STYLE_SCRIPT)
+        return True
+    except WebDriverException as e:
+        logger.debug(
+            f"Failed to inject lean style: {str(e).splitlines()[0] if str(e) else e}")
+        return False
+
+
+def cpu_seconds(driver):
+    """
+    Время работы основного потока страницы (TaskDuration из Performance.getMetrics), в секундах.
+    Значение накопительное — для запуска берётся разница двух замеров.
+    """
+    try:
+        driver.execute_cdp_cmd("Performance.enable", {})
+        metrics = driver.execute_cdp_cmd("Performance.getMetrics", {})
+    except WebDriverException as e:
+        logger.debug(
+            f"Failed to read performance metrics: {str(e).splitlines()[0] if str(e) else e}")
+        return None
+    for metric in metrics.get("metrics", []):
+        if metric.get("name") == "TaskDuration":
+            return float(metric.get("value") or 0.0)
+    return None
+
+
+def transferred_bytes(driver):
+    """
+    Сумма transferSize документа текущего фрейма и его ресурсов.
+    """
+    try:
+        return int(driver.execute_script(TRANSFER_SIZE_SCRIPT) or 0)
+    except (WebDriverException, TypeError, ValueError) as e:
+        logger.debug(
+            f"Failed to read transfer size: {str(e).splitlines()[0] if str(e) else e}")
+        return 0
+
+
+class RunCostStats:
+    """
+    Трафик и процессорное время запусков — отдельно с LEAN_MODE и без него,
+    чтобы сравнить режимы.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, mode, transferred, cpu):
+        with self._lock:
+            entry = self._stats.setdefault(mode, {
+                "runs": 0, "bytes": 0, "cpu": 0.0, "cpu_runs": 0})
+            entry["runs"] += 1
+            entry["bytes"] += transferred
+            if cpu is not None:
+                entry["cpu"] += cpu
+                entry["cpu_runs"] += 1
+
+    def summary(self):
+        with self._lock:
+            return {
+                mode: {
+                    "runs": entry["runs"],
+                    "avg_kb": round(entry["bytes"] / entry["runs"] / 1024, 1) if entry["runs"] else 0.0,
+                    "avg_cpu_seconds": round(entry["cpu"] / entry["cpu_runs"], 2) if entry["cpu_runs"] else None,
+                }
+                for mode, entry in self._stats.items()
+            }
+
+
+run_cost_stats = RunCostStats()
@@ -4,17 +4,27 @@ import signal
 import sys
 import argparse
 import os
-import json
 import traceback
 from queue import Queue, Empty
-from threading import Timer, Lock, Thread
+from threading import Lock, Thread
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from prettytable import PrettyTable
 from colorama import Fore, Style
 from update_manager import check_and_update, restart_script, ignore_files_in_git
-from telegram_bot_automation import TelegramBotAutomation
+from telegram_bot_automation import TelegramBotAutomation, launch_stats
+from scheduler import DeadlineScheduler, PolicyTaskQueue
+from state_store import get_state_store, AccountStateCache
+from adspower_client import get_client
+from browser_manager import get_session_pool
+from delay_policy import get_delay_policy
+from nuts_api import get_nuts_api
+from lean_mode import run_cost_stats
+from asset_cache import get_asset_cache
+from cache_policy import get_cache_policy, TelegramWebError
 import random
-from utils import get_accounts, reset_balances, setup_logger, load_settings, is_debug_enabled, GlobalFlags, stop_event, get_color, visible, check_requirements
+import time
+from utils import AccountId, get_accounts, reset_balances, setup_logger, load_settings, is_debug_enabled, GlobalFlags, stop_event, get_color, visible, check_requirements
 import logging
 # Настройка логирования
 logger = logging.getLogger("application_logger")
@@ -30,19 +40,27 @@ settings = load_settings()
 
 
 # Глобальные переменные
-bot = None
-active_timers = []
+# Единый планировщик запусков аккаунтов (вместо Timer на каждый аккаунт)
+scheduler = DeadlineScheduler()
 balance_dict = {}
 balance_lock = Lock()
 update_lock = Lock()
 task_lock = Lock()
-account_lock = Lock()
-active_profile_lock = Lock()
-task_queue = Queue()
-has_logged_queue_empty = False
+# Блокировки отдельных профилей: один профиль не обрабатывается двумя воркерами одновременно
+profile_locks = {}
+profile_locks_guard = Lock()
+# Живые экземпляры TelegramBotAutomation по аккаунтам (для закрытия при завершении)
+active_bots = {}
+active_bots_lock = Lock()
+# Заранее подготовленные браузеры следующих аккаунтов: account -> (bot, время подготовки)
+prewarmed_bots = {}
+prewarm_lock = Lock()
+prewarm_in_progress = set()
 DEFAULT_UPDATE_INTERVAL = 3 * 60 * 60  # 3 часа по умолчанию
+DEFAULT_MAX_CONCURRENT_PROFILES = 1
 temp_dir = "temp"
 TIMERS_FILE = os.path.join(temp_dir, "timers.json")  # Полный путь к файлу
+STATE_DB_FILE = os.path.join(temp_dir, "state.db")  # База состояния аккаунтов (SQLite)
 ROOT_TIMERS_FILE = "timers.json"  # Путь к файлу в корневой директории
 BACKUP_FILES_PATTERN = "*.backup"
 if not os.path.exists(temp_dir):
@@ -62,13 +80,36 @@ for backup_file in backup_files:
         logger.debug(f"Backup file moved: {backup_file} -> {target_path}")
     except Exception as e:
         logger.error(f"Failed to move backup file {backup_file} to temp: {e}")
-# Проверка и создание файла TIMERS_FILE, если он отсутствует
-if not os.path.exists(TIMERS_FILE):
-    with open(TIMERS_FILE, "w") as f:
-        json.dump({}, f)  # Создаём пустой JSON-файл
-    logger.debug(f"Timers file created: {TIMERS_FILE}")
-else:
-    logger.debug(f"Timers file already exists: {TIMERS_FILE}")
+# Хранилище состояния аккаунтов; при первом запуске переносим данные из timers.json
+state_store = get_state_store(STATE_DB_FILE)
+try:
+    state_store.migrate_from_json(TIMERS_FILE)
+except Exception as e:
+    logger.error(f"Failed to migrate timers file to state store: {e}")
+# Очередь задач с политикой выдачи из настройки TASK_SCHEDULING_POLICY;
+# длительности запусков для sjf сохраняются в хранилище состояния
+task_queue = PolicyTaskQueue(
+    settings.get("TASK_SCHEDULING_POLICY", "edf"), store=state_store)
+
+
+def get_int_setting(name, default):
+    """
+    Возвращает целочисленную настройку или значение по умолчанию.
+    """
+    value = settings.get(name, "").strip()
+    if value.isdigit():
+        return int(value)
+    if value:
+        logger.warning(f"Invalid value for '{name}': {value}. Using {default}.")
+    return default
+
+
+# Кэш состояния аккаунтов с отложенной пакетной записью в хранилище
+account_state = AccountStateCache(
+    state_store,
+    flush_interval=get_int_setting("STATE_FLUSH_INTERVAL", 5),
+    max_pending=get_int_setting("STATE_FLUSH_MAX_CHANGES", 50),
+)
 
 
 def schedule_periodic_update_check(task_queue: Queue, interval: int = DEFAULT_UPDATE_INTERVAL):
@@ -88,7 +129,7 @@ def schedule_periodic_update_check(task_queue: Queue, interval: int = DEFAULT_UP
                 found = any(
                     isinstance(task, tuple) and len(
                         task) >= 1 and task[0] == "check_updates"
-                    for task in list(task_queue.queue)
+                    for task in task_queue.tasks()
                 )
                 if not found:
                     logger.debug("Adding scheduled update check to queue...")
@@ -108,46 +149,15 @@ def schedule_periodic_update_check(task_queue: Queue, interval: int = DEFAULT_UP
 
 def load_timers():
     """
-    Загружает таймеры из JSON-файла, фильтрует устаревшие и возвращает актуальные данные.
+    Возвращает снимок актуальных таймеров (аккаунты с запуском в будущем) из кэша состояния.
 
-    :return: Словарь с таймерами.
+    :return: Неизменяемый словарь с таймерами.
     """
-    if not os.path.exists(TIMERS_FILE):
-        if is_debug_enabled():
-            logger.debug(
-                f"Timers file '{TIMERS_FILE}' does not exist. Returning empty dictionary.")
-        return {}
-
     try:
-        with open(TIMERS_FILE, "r") as f:
-            timers = json.load(f)
-
-        current_time = datetime.now()
-
-        # Фильтруем устаревшие таймеры
-        filtered_timers = {
-            account: data
-            for account, data in timers.items()
-            if datetime.strptime(data["next_schedule"], "%Y-%m-%d %H:%M:%S") > current_time
-        }
-
-        if is_debug_enabled():
-            logger.debug(
-                f"Loaded {len(timers)} timers, {len(filtered_timers)} remain after filtering.")
-
-        # Сохраняем обновлённый список таймеров
-        save_timers(filtered_timers)
-
-        return filtered_timers
-    except json.JSONDecodeError as e:
-        logger.error(
-            f"Failed to parse timers file '{TIMERS_FILE}'. Invalid JSON format: {e}")
-    except KeyError as e:
-        logger.error(
-            f"Missing key in timers data. Details: {e}")
+        timers = account_state.snapshot(scheduled_after=datetime.now())
         if is_debug_enabled():
-            logger.debug(
-                f"Full timers content causing the issue:", exc_info=True)
+            logger.debug(f"Loaded {len(timers)} active timers from state store.")
+        return timers
     except Exception as e:
         logger.error(
             f"An unexpected error occurred while loading timers.")
@@ -158,125 +168,282 @@ def load_timers():
     return {}
 
 
-def save_timers(timers):
+def get_max_concurrent_profiles():
     """
-    Сохраняет таймеры в JSON-файл.
+    Возвращает размер пула воркеров из настройки MAX_CONCURRENT_PROFILES.
+    """
+    value = settings.get("MAX_CONCURRENT_PROFILES", "").strip()
+    if not value:
+        return DEFAULT_MAX_CONCURRENT_PROFILES
+    if value.isdigit() and int(value) > 0:
+        return int(value)
+    logger.warning(
+        f"Invalid value for 'MAX_CONCURRENT_PROFILES': {value}. Using {DEFAULT_MAX_CONCURRENT_PROFILES}.")
+    return DEFAULT_MAX_CONCURRENT_PROFILES
+
 
-    :param timers: Словарь с таймерами.
+def get_profile_lock(account):
     """
-    try:
-        with open(TIMERS_FILE, "w") as f:
-            json.dump(timers, f, indent=4)
+    Возвращает блокировку конкретного профиля, создавая её при первом обращении.
+    """
+    with profile_locks_guard:
+        lock = profile_locks.get(account)
+        if lock is None:
+            lock = Lock()
+            profile_locks[account] = lock
+        return lock
 
-        if is_debug_enabled():
-            logger.debug(
-                f"Successfully saved {len(timers)} timers to file '{TIMERS_FILE}'.")
-    except IOError as e:
-        logger.error(
-            f"Failed to write timers to file '{TIMERS_FILE}'. Check file permissions or disk space.")
-        if is_debug_enabled():
-            logger.debug(
-                f"IOError details: {str(e)}", exc_info=True)
+
+def register_bot(account, bot):
+    with active_bots_lock:
+        active_bots[account] = bot
+
+
+def unregister_bot(account, bot):
+    with active_bots_lock:
+        if active_bots.get(account) is bot:
+            active_bots.pop(account, None)
+
+
+def prewarm_enabled():
+    return settings.get("PREWARM_NEXT_PROFILE", "false").strip().lower() == "true"
+
+
+def find_prewarm_candidate(current_account):
+    """
+    Выбирает следующий аккаунт для подготовки: первый в очереди, а если очередь пуста —
+    ближайший запуск планировщика в пределах PREWARM_HORIZON секунд.
+    """
+    candidate = None
+    queued = task_queue.peek()
+    if queued:
+        candidate = AccountId(queued[0][0])
+    else:
+        upcoming = scheduler.peek()
+        horizon = get_int_setting("PREWARM_HORIZON", 120)
+        if upcoming and (upcoming[1] - datetime.now()).total_seconds() <= horizon:
+            candidate = AccountId(upcoming[0])
+    if candidate is None or candidate == current_account:
+        return None
+    return candidate
+
+
+def prewarm_account(account):
+    """
+    Запускает браузер профиля и загружает Telegram Web, пока занята блокировка профиля.
+    Подготовленный бот забирает process_account этого аккаунта.
+    """
+    profile_lock = get_profile_lock(account)
+    if not profile_lock.acquire(blocking=False):
+        with prewarm_lock:
+            prewarm_in_progress.discard(account)
+        return
+    bot = None
+    try:
+        logger.debug(f"#{account}: Prewarming browser for the next run.")
+        started_at = time.time()
+        bot = TelegramBotAutomation(account, settings)
+        register_bot(account, bot)
+        if stop_event.is_set() or not bot.navigate_to_bot():
+            raise RuntimeError("Failed to prewarm Telegram web")
+        with prewarm_lock:
+            prewarmed_bots[account] = (bot, time.time())
+        logger.debug(
+            f"#{account}: Browser prewarmed in {time.time() - started_at:.1f} seconds.")
     except Exception as e:
-        logger.error("An unexpected error occurred while saving timers.")
-        if is_debug_enabled():
-            logger.debug(
-                f"Error details: {str(e)}", exc_info=True)
+        logger.debug(f"#{account}: Prewarm failed: {e}")
+        if bot and not stop_event.is_set():
+            close_browser_quietly(account, bot)
+            unregister_bot(account, bot)
+    finally:
+        with prewarm_lock:
+            prewarm_in_progress.discard(account)
+        profile_lock.release()
+
+
+def start_prewarm(current_account):
+    """
+    Начинает подготовку браузера следующего аккаунта в фоне (режим PREWARM_NEXT_PROFILE).
+    Одновременно готовится не больше одного аккаунта.
+    """
+    if not prewarm_enabled() or stop_event.is_set():
+        return
+    discard_stale_prewarmed_bots()
+    candidate = find_prewarm_candidate(current_account)
+    if candidate is None:
+        return
+    with prewarm_lock:
+        if prewarm_in_progress or prewarmed_bots:
+            return
+        prewarm_in_progress.add(candidate)
+    Thread(target=prewarm_account, args=(candidate,),
+           name=f"prewarm-{candidate}", daemon=True).start()
+
+
+def take_prewarmed_bot(account):
+    """
+    Забирает подготовленного бота аккаунта, если он есть и не устарел.
+    """
+    with prewarm_lock:
+        entry = prewarmed_bots.pop(account, None)
+    if entry is None:
+        return None
+    bot, prepared_at = entry
+    if time.time() - prepared_at > get_int_setting("PREWARM_MAX_IDLE", 300):
+        logger.debug(f"#{account}: Prewarmed browser is stale. Closing.")
+        close_browser_quietly(account, bot)
+        unregister_bot(account, bot)
+        return None
+    return bot
+
+
+def discard_stale_prewarmed_bots():
+    """
+    Закрывает подготовленные браузеры, которые так и не были использованы.
+    """
+    max_idle = get_int_setting("PREWARM_MAX_IDLE", 300)
+    with prewarm_lock:
+        stale = [(account, bot) for account, (bot, prepared_at) in prewarmed_bots.items()
+                 if time.time() - prepared_at > max_idle]
+        for account, _ in stale:
+            prewarmed_bots.pop(account, None)
+    for account, bot in stale:
+        logger.debug(f"#{account}: Prewarmed browser was not used in time. Closing.")
+        close_browser_quietly(account, bot)
+        unregister_bot(account, bot)
 
 
 # Основная обработка аккаунта
-def process_account(account, balance_dict, active_timers):
+def process_account(account, balance_dict, scheduler):
     """
     Обрабатывает указанный аккаунт, выполняя задания и обновляя данные балансов.
-    Если другой аккаунт уже обрабатывается, ждёт его завершения.
+    Если этот же профиль уже обрабатывается другим воркером, ждёт его завершения.
     """
 
+    account = AccountId(account)
     logger.info(f"Processing account: {account}", extra={'color': Fore.CYAN})
     retry_count = 0
     success = False
     message_logged = False
-    global bot
+    profile_lock = get_profile_lock(account)
 
     while not stop_event.is_set():
-        # Пытаемся захватить блокировку
-        if active_profile_lock.acquire(blocking=False):
+        # Пытаемся захватить блокировку профиля
+        if profile_lock.acquire(blocking=False):
             try:
                 logger.debug(
                     f"#{account}: Starting processing for account: {account}")
-                with account_lock:
-                    while retry_count < 3 and not success and not stop_event.is_set():
-                        try:
-                            if stop_event.is_set():
-                                logger.debug(
-                                    f"#{account}: Stop event detected. Exiting.")
-                                return
+                while retry_count < 3 and not success and not stop_event.is_set():
+                    bot = None
+                    next_due = None
+                    started_at = time.time()
+                    paused_before = get_delay_policy().account_total(account)
+                    try:
+                        if stop_event.is_set():
+                            logger.debug(
+                                f"#{account}: Stop event detected. Exiting.")
+                            return
 
-                            # Инициализация объекта TelegramBotAutomation
+                        # Браузер, подготовленный заранее, пока обрабатывался предыдущий аккаунт
+                        bot = take_prewarmed_bot(account)
+                        prewarmed = bot is not None
+                        if prewarmed:
+                            logger.debug(
+                                f"#{account}: Using prewarmed browser.")
+                        else:
+                            # Инициализация объекта TelegramBotAutomation (свой для каждого воркера)
                             bot = TelegramBotAutomation(account, settings)
+                        register_bot(account, bot)
 
-                            # Выполнение действий
-                            navigate_and_perform_actions(bot, account)
+                        # Выполнение действий
+                        navigate_and_perform_actions(
+                            bot, account, skip_navigation=prewarmed)
 
-                            # Получение данных аккаунта
-                            username = bot.get_username()
-                            if not username or username == "N/A":
-                                raise ValueError(
-                                    f"#{account}: Invalid username")
+                        # Получение данных аккаунта
+                        username = bot.get_username()
+                        if not username or username == "N/A":
+                            raise ValueError(
+                                f"#{account}: Invalid username")
 
-                            balance = parse_balance(bot.get_balance())
-                            if balance <= 0:
-                                raise ValueError(
-                                    f"#{account}: Invalid balance")
+                        balance = parse_balance(bot.get_balance())
+                        if balance <= 0:
+                            raise ValueError(
+                                f"#{account}: Invalid balance")
 
-                            next_schedule = calculate_next_schedule(
-                                bot.get_time())
+                        next_schedule = calculate_next_schedule(
+                            bot.get_time())
 
-                            # Обновление баланса
-                            update_balance_info(
-                                account, username, balance, next_schedule, "Success", balance_dict
-                            )
-                            success = True
-                            logger.info(
-                                f"#{account}: Next schedule: {next_schedule.strftime('%Y-%m-%d %H:%M:%S')}"
-                            )
-
-                            # Установка таймера
-                            if next_schedule:
-                                schedule_next_run(
-                                    account, next_schedule, balance_dict, active_timers
-                                )
+                        # Обновление баланса
+                        update_balance_info(
+                            account, username, balance, next_schedule, "Success", balance_dict
+                        )
+                        success = True
+                        run_duration = time.time() - started_at
+                        task_queue.record_duration(account, run_duration)
+                        paused = get_delay_policy().account_total(account) - paused_before
+                        logger.info(
+                            f"#{account}: Intentional pauses: {paused:.1f}s of {run_duration:.1f}s run time.")
+                        logger.debug(
+                            f"#{account}: Pauses by step: {get_delay_policy().account_stats(account)}")
+                        logger.info(
+                            f"#{account}: Next schedule: {next_schedule.strftime('%Y-%m-%d %H:%M:%S')}"
+                        )
 
-                        except Exception as e:
-                            retry_count += 1
-                            logger.debug(
-                                f"#{account}: Error on attempt {retry_count}: {e}"
+                        # Установка таймера
+                        if next_schedule:
+                            next_due = next_schedule
+                            schedule_next_run(
+                                account, next_schedule, balance_dict, scheduler
                             )
-                            update_balance_info(
-                                account, "N/A", 0.0, datetime.now(), "ERROR", balance_dict
-                            )
-                            if retry_count >= 3:
-                                retry_delay = random.randint(
-                                    1800, 4200)  # 30–70 минут
-                                next_retry_time = datetime.now() + timedelta(seconds=retry_delay)
-                                schedule_retry(
-                                    account, next_retry_time, balance_dict, active_timers, retry_delay
-                                )
 
-                        finally:
-                            if not stop_event.is_set():
-                                if bot:
-                                    try:
-                                        bot.browser_manager.close_browser()
-                                    except Exception:
-                                        logger.debug(
-                                            f"#{account}: Failed to close browser.")
+                    except Exception as e:
+                        retry_count += 1
+                        logger.debug(
+                            f"#{account}: Error on attempt {retry_count}: {e}"
+                        )
+                        if isinstance(e, TelegramWebError) and not stop_event.is_set():
+                            # Telegram Web не загрузился — вероятно, устаревшее состояние кэша,
+                            # при следующем запуске очистить его. Остальные ошибки (баланс,
+                            # имя пользователя, запуск приложения) кэш не затрагивают
+                            try:
+                                get_cache_policy().mark_stale(account, e)
+                            except Exception as policy_error:
+                                logger.debug(
+                                    f"#{account}: Failed to update cache policy: {policy_error}")
+                        update_balance_info(
+                            account, "N/A", 0.0, datetime.now(), "ERROR", balance_dict
+                        )
+                        if retry_count >= 3:
+                            retry_delay = random.randint(
+                                1800, 4200)  # 30–70 минут
+                            next_retry_time = datetime.now() + timedelta(seconds=retry_delay)
+                            next_due = next_retry_time
+                            schedule_retry(
+                                account, next_retry_time, balance_dict, scheduler, retry_delay
+                            )
+                        else:
+                            # Следующая попытка начнётся сразу
+                            next_due = datetime.now()
+
+                    finally:
+                        # При остановке браузеры закрывает cleanup_resources
+                        if not stop_event.is_set():
+                            if bot:
+                                # Закрывает браузер или оставляет его открытым для близкого запуска
+                                try:
+                                    get_session_pool().release(
+                                        bot.browser_manager, next_due)
+                                except Exception:
+                                    logger.debug(
+                                        f"#{account}: Failed to close browser.")
+                                unregister_bot(account, bot)
 
                 if success:
                     generate_and_display_table(
                         balance_dict, table_type="balance", show_total=True)
 
             finally:
-                active_profile_lock.release()
+                profile_lock.release()
                 logger.debug(f"#{account}: Completed processing for account.")
             break  # Выходим из цикла ожидания
 
@@ -296,35 +463,39 @@ def process_account(account, balance_dict, active_timers):
 # Навигация и выполнение действий с ботом
 
 
-def navigate_and_perform_actions(bot, account):
+def navigate_and_perform_actions(bot, account, skip_navigation=False):
     """
     Навигация и выполнение всех задач с ботом.
+
+    :param skip_navigation: Telegram Web уже загружен (подготовленный заранее браузер).
     """
     if stop_event.is_set():
         logger.info("Stop event detected. Aborting navigation and actions.")
         return
 
-    if not bot.navigate_to_bot():
-        raise Exception("Failed to navigate to bot")
-
-    if stop_event.is_set():
-        logger.debug("Stop event detected. Aborting after navigation.")
-        return
+    # Сохранённая ссылка запуска открывает приложение сразу, без Telegram Web
+    if skip_navigation or not bot.open_cached_app():
+        if stop_event.is_set():
+            return
 
-    if not bot.send_message():
-        raise Exception("Failed to send message")
+        if not skip_navigation and not bot.navigate_to_bot():
+            raise TelegramWebError("Failed to navigate to bot")
 
-    if stop_event.is_set():
-        logger.debug("Stop event detected. Aborting after sending message.")
-        return
+        if stop_event.is_set():
+            logger.debug("Stop event detected. Aborting after navigation.")
+            return
 
-    if not bot.click_link():
-        raise Exception("Failed to start app")
+        # Запуск мини-приложения (напрямую по ссылке или через группу — LAUNCH_STRATEGY)
+        if not bot.launch_app():
+            raise Exception("Failed to start app")
 
     if stop_event.is_set():
         logger.debug("Stop event detected. Aborting after starting app.")
         return
 
+    # Пока идут игровые шаги, готовим браузер следующего аккаунта
+    start_prewarm(account)
+
     logger.debug("Preparing account...")
     bot.preparing_account()
 
@@ -342,15 +513,21 @@ def navigate_and_perform_actions(bot, account):
         logger.debug("Stop event detected. Aborting before performing quests.")
         return
 
-    logger.debug("Performing quests...")
-    bot.perform_quests()  # Выполнение квестов
+    # Квесты и курсы пропускаются, пока не настало время перепроверки (PROGRESS_RECHECK_HOURS)
+    if bot.stage_due("quests"):
+        logger.debug("Performing quests...")
+        bot.perform_quests()  # Выполнение квестов
+
+    if stop_event.is_set():
+        return
 
-    if bot.click_earn_tab():
+    if bot.stage_due("courses") and bot.click_earn_tab():
         bot.run_courses_automation()
 
     bot.click_home_tab()
     logger.debug("Starting farming again...")
     bot.farming()
+    bot.finish_run()
 
 # Парсинг баланса
 
@@ -454,18 +631,16 @@ def update_balance_info(account, username, balance, next_schedule, status, balan
                 "next_schedule": next_schedule.strftime("%Y-%m-%d %H:%M:%S"),
                 "status": status,
             }
+            account_data = dict(balance_dict[account])
 
-            # Загрузка и обновление таймеров
-            timers_data = load_timers()
-            # Синхронизация данных
-            timers_data[account] = balance_dict[account]
-            save_timers(timers_data)
+        # Изменение попадает в кэш состояния, на диск его сбросит фоновый поток
+        account_state.upsert(account, **account_data)
 
-            if is_debug_enabled():
-                logger.debug(
-                    f"#{account}: updated: "
-                    f"Username: {username}, Balance: {balance}, Next Schedule: {next_schedule.strftime('%Y-%m-%d %H:%M:%S')}, Status: {status}"
-                )
+        if is_debug_enabled():
+            logger.debug(
+                f"#{account}: updated: "
+                f"Username: {username}, Balance: {balance}, Next Schedule: {next_schedule.strftime('%Y-%m-%d %H:%M:%S')}, Status: {status}"
+            )
     except Exception as e:
         logger.error(
             f"#{account}: Error updating balance info for account {account}: {e}")
@@ -475,66 +650,44 @@ def update_balance_info(account, username, balance, next_schedule, status, balan
 
 
 # Планирование следующего запуска
-def schedule_next_run(account, next_schedule, balance_dict, active_timers):
+def schedule_next_run(account, next_schedule, balance_dict, scheduler):
     """
     Планирует следующий запуск для указанного аккаунта.
 
     :param account: Аккаунт для запуска.
     :param next_schedule: Время следующего запуска.
     :param balance_dict: Словарь с балансами аккаунтов.
-    :param active_timers: Список активных таймеров.
+    :param scheduler: Планировщик запусков.
     """
     try:
         delay = (next_schedule - datetime.now()).total_seconds()
 
         if delay > 0:
-            with balance_lock:
-                if stop_event.is_set():
-                    logger.info(
-                        f"#{account}: Stop event set. Skipping scheduling for {account}.")
-                    return
+            if stop_event.is_set():
+                logger.info(
+                    f"#{account}: Stop event set. Skipping scheduling for {account}.")
+                return
 
-                timers_data = load_timers()
+            with balance_lock:
                 account_data = balance_dict.get(account, {})
                 username = account_data.get("username", "N/A")
                 balance = account_data.get("balance", 0.0)
 
-                # Обновляем информацию о таймере
-                timers_data[account] = {
-                    "username": username,
-                    "next_schedule": next_schedule.strftime("%Y-%m-%d %H:%M:%S"),
-                    "status": "Active",
-                    "balance": balance,
-                }
-                save_timers(timers_data)
-
-            def run_after_delay():
-                """
-                Задача, выполняемая после задержки. Добавляет аккаунт в очередь.
-                """
-                if stop_event.is_set():
-                    logger.info(
-                        f"#{account}: Stop event set. Skipping execution of scheduled task.")
-                    return
-
-                with balance_lock:
-                    timers_data = load_timers()
-                    timers_data.pop(account, None)
-                    save_timers(timers_data)
-
-                # Добавляем задачу в очередь обработки
-                logger.debug(
-                    f"#{account}: Adding account to task queue after delay.")
-                task_queue.put((account, balance_dict, active_timers))
+            # Обновляем информацию о таймере
+            account_state.upsert(
+                account,
+                username=username,
+                next_schedule=next_schedule,
+                status="Active",
+                balance=balance,
+            )
 
-            # Создаём таймер и запускаем его
-            timer = Timer(delay, run_after_delay)
-            active_timers.append(timer)
-            timer.start()
+            # Планируем запуск (повторное планирование заменяет предыдущее)
+            scheduler.schedule(account, next_schedule, "next_run")
 
             if is_debug_enabled():
                 logger.debug(
-                    f"#{account}: Timer set for {next_schedule.strftime('%Y-%m-%d %H:%M:%S')} "
+                    f"#{account}: Run scheduled for {next_schedule.strftime('%Y-%m-%d %H:%M:%S')} "
                     f"with a delay of {delay:.2f} seconds."
                 )
         else:
@@ -551,12 +704,13 @@ def schedule_next_run(account, next_schedule, balance_dict, active_timers):
             )
 
 
-def task_queue_processor(task_queue, active_timers):
-    global has_logged_queue_empty
+def task_queue_processor(task_queue, scheduler, worker_id=1):
     """
-    Основной обработчик задач из очереди. Выполняет задачи последовательно.
+    Воркер пула: забирает задачи из общей очереди и выполняет их.
+    Одновременно работают MAX_CONCURRENT_PROFILES таких воркеров.
     """
-    logger.debug("Task queue processor started.")
+    has_logged_queue_empty = False
+    logger.debug(f"Task queue processor #{worker_id} started.")
     while not stop_event.is_set():
         try:
             # Получаем задачу из очереди с таймаутом
@@ -593,10 +747,10 @@ def task_queue_processor(task_queue, active_timers):
                         except Exception as e:
                             logger.debug(f"Error during update check: {e}")
                 elif len(task) == 3:  # Task: process_account
-                    account, balance_dict, active_timers = task
+                    account, balance_dict, scheduler = task
                     logger.debug(f"Processing account {account} from queue.")
                     try:
-                        process_account(account, balance_dict, active_timers)
+                        process_account(account, balance_dict, scheduler)
                     except Exception as e:
                         logger.debug(
                             f"Error processing account {account}: {e}")
@@ -620,18 +774,61 @@ def task_queue_processor(task_queue, active_timers):
         except Exception as e:
             logger.debug(f"Unhandled exception in task processor: {e}")
 
-    logger.debug("Task queue processor stopped.")
+    logger.debug(f"Task queue processor #{worker_id} stopped.")
+
+
+def start_task_workers(task_queue, scheduler, worker_count):
+    """
+    Запускает пул воркеров, обрабатывающих очередь задач.
+
+    :return: Список потоков воркеров.
+    """
+    workers = []
+    for worker_id in range(1, worker_count + 1):
+        worker = Thread(
+            target=task_queue_processor,
+            args=(task_queue, scheduler, worker_id),
+            name=f"task-worker-{worker_id}",
+            daemon=True
+        )
+        worker.start()
+        workers.append(worker)
+    logger.debug(f"Started {worker_count} task queue workers.")
+    return workers
+
+
+def run_scheduled_account(account, reason, deadline):
+    """
+    Вызывается планировщиком при наступлении времени запуска.
+    Добавляет аккаунт в очередь обработки.
+
+    :param account: Аккаунт для запуска.
+    :param reason: "next_run" для планового запуска или "retry" для повторной попытки.
+    :param deadline: Запланированное время запуска (для политики edf и учёта опоздания).
+    """
+    if stop_event.is_set():
+        logger.info(
+            f"#{account}: Stop event set. Skipping execution of scheduled task.")
+        return
+
+    if reason == "next_run":
+        account_state.delete(account)
+
+    # Добавляем задачу в очередь обработки
+    logger.debug(
+        f"#{account}: Adding account to task queue ({reason}).")
+    task_queue.put((account, balance_dict, scheduler), deadline=deadline)
 
 
 # Планирование повторной попытки
-def schedule_retry(account, next_retry_time, balance_dict, active_timers, retry_delay):
+def schedule_retry(account, next_retry_time, balance_dict, scheduler, retry_delay):
     """
     Планирование повторной попытки выполнения.
 
     :param account: Аккаунт для повторной попытки.
     :param next_retry_time: Время следующей попытки.
     :param balance_dict: Словарь с балансами аккаунтов.
-    :param active_timers: Список активных таймеров.
+    :param scheduler: Планировщик запусков.
     :param retry_delay: Задержка перед повторной попыткой (в секундах).
     """
     try:
@@ -646,31 +843,8 @@ def schedule_retry(account, next_retry_time, balance_dict, active_timers, retry_
             account, "N/A", 0.0, next_retry_time, "ERROR", balance_dict
         )
 
-        def retry_task():
-            """
-            Запускает повторную попытку process_account после задержки.
-            """
-            try:
-                if stop_event.is_set():
-                    logger.debug(
-                        f"#{account}: Stop event detected. Cancelling retry.")
-                    return  # Прерываем выполнение задачи
-
-                logger.debug(
-                    f"#{account}: Retrying process_account after delay.")
-                process_account(account, balance_dict, active_timers)
-            except Exception as retry_error:
-                logger.debug(
-                    f"#{account}: Exception during retry execution: {retry_error}", exc_info=True
-                )
-            finally:
-                # Удаляем таймер из active_timers после завершения
-                active_timers.remove(timer)
-
-        # Создаём таймер и добавляем в список активных таймеров
-        timer = Timer(retry_delay, retry_task)
-        active_timers.append(timer)
-        timer.start()
+        # Повтор выполнит воркер пула, когда планировщик вернёт аккаунт в очередь
+        scheduler.schedule(account, next_retry_time, "retry")
 
         # Логирование для отладки
         logger.debug(
@@ -772,26 +946,15 @@ def generate_and_display_table(data, table_type="balance", show_total=True):
 def sync_timers_with_balance(balance_dict):
     """
     Синхронизирует данные активных таймеров с балансами.
-    Загружает данные из timers.json и добавляет их в balance_dict,
+    Загружает актуальные таймеры из хранилища состояния и добавляет их в balance_dict,
     если соответствующие аккаунты отсутствуют или их данные устарели.
     """
     try:
+        # В снимок попадают только таймеры с запуском в будущем
         timers_data = load_timers()
-        current_time = datetime.now()
 
         with balance_lock:
-            for account, timer_info in list(timers_data.items()):
-                next_schedule = datetime.strptime(
-                    timer_info["next_schedule"], "%Y-%m-%d %H:%M:%S")
-
-                # Удаляем устаревшие таймеры
-                if next_schedule <= current_time:
-                    if is_debug_enabled():
-                        logger.debug(
-                            f"Timer expired and removed from timers.")
-                    timers_data.pop(account)
-                    continue
-
+            for account, timer_info in timers_data.items():
                 # Если аккаунт отсутствует в balance_dict или его данные устарели, добавляем/обновляем его
                 if account not in balance_dict or balance_dict[account]["next_schedule"] != timer_info["next_schedule"]:
                     balance_dict[account] = {
@@ -805,9 +968,6 @@ def sync_timers_with_balance(balance_dict):
                         logger.debug(
                             f"Timer data synced with balance.")
 
-        # Сохраняем обновленный список таймеров
-        save_timers(timers_data)
-
         if is_debug_enabled():
             logger.debug(
                 f"Timers successfully synced with balance dictionary.")
@@ -820,26 +980,40 @@ def sync_timers_with_balance(balance_dict):
                 f"Error traceback:", exc_info=True)
 
 
-def cleanup_resources(active_timers, task_queue):
-    global bot
+def close_browser_quietly(account, bot):
+    """
+    Закрывает браузер аккаунта при завершении, не прерывая остальные закрытия.
+    """
+    try:
+        logger.info(f"#{account}: Closing browser during cleanup...",
+                    extra={'color': Fore.CYAN})
+        bot.browser_manager.close_browser()
+    except Exception as browser_error:
+        logger.warning(f"#{account}: Failed to close browser: {browser_error}")
+
+
+def cleanup_resources(scheduler, task_queue):
     """
-    Останавливает все активные таймеры, выполняет очистку ресурсов и очищает очередь.
+    Останавливает планировщик, выполняет очистку ресурсов и очищает очередь.
     """
     logger.info("Cleaning up active timers...", extra={'color': Fore.YELLOW})
 
-    # Завершаем все таймеры
+    # Останавливаем планировщик и сбрасываем все ожидающие запуски
     try:
-        # Создаём копию списка для безопасного перебора
-        for timer in list(active_timers):
-            if timer.is_alive():
-                logger.debug("Cancelling active timer during cleanup.")
-                timer.cancel()
-        active_timers.clear()
-        logger.debug("All active timers have been cleared.")
+        logger.debug(f"Scheduler stats before cleanup: {scheduler.stats()}")
+        scheduler.stop()
+        logger.debug("All scheduled runs have been cleared.")
     except Exception as timer_error:
         logger.debug(
             f"Exception during timers cleanup: {timer_error}", exc_info=True)
 
+    # Сбрасываем на диск все несохранённые изменения состояния
+    try:
+        account_state.close()
+        logger.debug(f"Account state flushed: {account_state.stats()}")
+    except Exception as state_error:
+        logger.error(f"Failed to flush account state: {state_error}")
+
     # Очищаем задачи из очереди
     try:
         while not task_queue.empty():
@@ -851,16 +1025,72 @@ def cleanup_resources(active_timers, task_queue):
         logger.debug(
             f"Exception during task queue cleanup: {queue_error}", exc_info=True)
 
-    # Закрываем браузер, если он существует
-    if bot:
+    # Подготовленные браузеры закрываются вместе с активными (они есть в active_bots)
+    with prewarm_lock:
+        prewarmed_bots.clear()
+
+    # Закрываем браузеры, оставленные открытыми для повторного использования
+    try:
+        session_pool = get_session_pool()
+        logger.debug(f"Browser session pool stats: {session_pool.stats()}")
+        session_pool.close_all()
+    except Exception as pool_error:
+        logger.debug(
+            f"Exception during browser pool cleanup: {pool_error}", exc_info=True)
+
+    # Закрываем все живые браузеры параллельно
+    with active_bots_lock:
+        bots = list(active_bots.items())
+        active_bots.clear()
+    if bots:
         try:
-            logger.info("Closing browser during cleanup...",
-                        extra={'color': Fore.CYAN})
-            bot.browser_manager.close_browser()
+            with ThreadPoolExecutor(max_workers=len(bots)) as executor:
+                for account, bot in bots:
+                    executor.submit(close_browser_quietly, account, bot)
         except Exception as browser_error:
-            logger.warning(f"Failed to close browser: {browser_error}")
-        finally:
-            bot = None  # Очищаем глобальный объект `bot` для предотвращения утечек
+            logger.debug(
+                f"Exception during browsers cleanup: {browser_error}", exc_info=True)
+
+    try:
+        logger.debug(f"Mini app launch stats: {launch_stats.summary()}")
+    except Exception as launch_error:
+        logger.debug(f"Failed to collect launch stats: {launch_error}")
+
+    try:
+        asset_cache = get_asset_cache()
+        if asset_cache:
+            asset_cache.save()
+            logger.debug(f"Asset cache stats: {asset_cache.stats()}")
+    except Exception as asset_error:
+        logger.debug(f"Failed to collect asset cache stats: {asset_error}")
+
+    try:
+        logger.debug(f"Telegram web load times: {get_cache_policy().stats()}")
+    except Exception as cache_error:
+        logger.debug(f"Failed to collect cache policy stats: {cache_error}")
+
+    try:
+        logger.debug(f"Run cost stats: {run_cost_stats.summary()}")
+    except Exception as cost_error:
+        logger.debug(f"Failed to collect run cost stats: {cost_error}")
+
+    try:
+        logger.debug(f"Delay policy stats: {get_delay_policy().stats()}")
+    except Exception as delay_error:
+        logger.debug(f"Failed to collect delay policy stats: {delay_error}")
+
+    try:
+        logger.debug(f"AdsPower API metrics: {get_client().metrics()}")
+    except Exception as api_error:
+        logger.debug(f"Failed to collect AdsPower API metrics: {api_error}")
+
+    try:
+        nuts_api = get_nuts_api()
+        if nuts_api.enabled:
+            logger.debug(f"NUTS API fast path stats: {nuts_api.stats()}")
+        nuts_api.close()
+    except Exception as nuts_api_error:
+        logger.debug(f"Failed to collect NUTS API stats: {nuts_api_error}")
 
     logger.info("All resources cleaned up. Exiting gracefully.",
                 extra={'color': Fore.MAGENTA})
@@ -880,7 +1110,7 @@ if __name__ == "__main__":
     sys.excepthook = handle_uncaught_exception
     signal.signal(signal.SIGINT, signal.default_int_handler)
 
-    task_processor_thread = None  # Инициализируем переменную
+    task_workers = []  # Потоки пула воркеров
     try:
         # Настройка аргументов командной строки
         parser = argparse.ArgumentParser(
@@ -888,7 +1118,7 @@ if __name__ == "__main__":
         )
         parser.add_argument("--debug", action="store_true",
                             help="Enable debug logging")
-        parser.add_argument("--account", type=int,
+        parser.add_argument("--account", type=AccountId,
                             help="Force processing a specific account")
         parser.add_argument(
             "--visible", type=int, choices=[0, 1], default=0, help="Set visible mode (1 for visible, 0 for headless)"
@@ -921,39 +1151,41 @@ if __name__ == "__main__":
             account = args.account
             logger.debug(f"Processing account {args.account} in debug mode...")
             try:
-                process_account(args.account, balance_dict, active_timers)
+                process_account(args.account, balance_dict, scheduler)
                 logger.info(
                     f"Account {args.account} processing completed. Exiting.")
             except Exception as e:
                 logger.error(f"Error during forced account processing: {e}")
             finally:
-                cleanup_resources(active_timers, task_queue)
+                cleanup_resources(scheduler, task_queue)
                 sys.exit(0)  # Завершаем выполнение после обработки аккаунта
 
-        # Загрузка настроек и таймеров
-        timers_data = load_timers()
+        # Загрузка настроек
         update_interval = int(settings.get(
             "UPDATE_INTERVAL", DEFAULT_UPDATE_INTERVAL))
         logger.debug("Performing initial update check...")
         check_and_update(priority_task_queue=task_queue,
                          is_task_active=lambda: not task_queue.empty())
         schedule_periodic_update_check(task_queue, update_interval)
+
+        # Запуск пула воркеров очереди задач
+        max_concurrent_profiles = get_max_concurrent_profiles()
+        logger.info(
+            f"Processing up to {max_concurrent_profiles} profiles concurrently.")
+        scheduler.start(on_due=run_scheduled_account)
+        task_workers = start_task_workers(
+            task_queue, scheduler, max_concurrent_profiles)
         while not stop_event.is_set():
             try:
                 reset_balances()
                 accounts = get_accounts()
                 sync_timers_with_balance(balance_dict)
+                timers_data = load_timers()
+                # Просроченные запуски (например, пока скрипт был остановлен) — для политики edf
+                overdue_runs = account_state.due_before(datetime.now())
                 generate_and_display_table(timers_data, table_type="timers")
                 logger.info("Starting account processing cycle.")
 
-                # Запуск обработчика очереди задач
-                task_processor_thread = Thread(
-                    target=task_queue_processor,
-                    args=(task_queue, active_timers),
-                    daemon=True
-                )
-                task_processor_thread.start()
-
                 # Обработка аккаунтов
                 for account in accounts:
                     if stop_event.is_set():
@@ -973,21 +1205,29 @@ if __name__ == "__main__":
                                     f"#{account}: Account scheduled for {next_schedule}. Skipping immediate processing."
                                 )
                                 schedule_next_run(
-                                    account, next_schedule, balance_dict, active_timers)
+                                    account, next_schedule, balance_dict, scheduler)
                                 continue
                         if stop_event.is_set():  # Дополнительная проверка перед добавлением в очередь
                             break
                         logger.debug(
                             f"#{account}: Adding account to task queue for processing.")
-                        task_queue.put((account, balance_dict, active_timers))
+                        task_queue.put((account, balance_dict, scheduler),
+                                       deadline=overdue_runs.get(account))
                     except Exception as e:
                         logger.error(
                             f"Error while scheduling account {account}: {e}")
 
                 # Ожидание завершения таймеров
-                while not stop_event.is_set() and any(timer.is_alive() for timer in active_timers):
-                    # Используем stop_event для быстрой проверки и выхода
-                    stop_event.wait(1)
+                while not stop_event.is_set() and scheduler.pending():
+                    # Планировщик сам будит воркеры; здесь лишь ждём опустошения
+                    if is_debug_enabled():
+                        logger.debug(f"Scheduler stats: {scheduler.stats()}")
+                        logger.debug(f"Task queue stats: {task_queue.stats()}")
+                        logger.debug(
+                            f"AdsPower API metrics: {get_client().metrics()}")
+                    stop_event.wait(60)
+
+                logger.info(f"Task queue stats: {task_queue.stats()}")
 
                 # Повторное ожидание цикла
                 if not stop_event.is_set():
@@ -1005,20 +1245,24 @@ if __name__ == "__main__":
     except Exception as e:
         logger.error(f"Unhandled exception in main loop: {e}")
     finally:
-        logger.debug("Waiting for task queue processor to stop...")
-        task_queue.put(None)
+        logger.debug("Waiting for task queue workers to stop...")
+        for _ in task_workers:
+            task_queue.put(None)
 
-        if task_processor_thread and task_processor_thread.is_alive():
+        for worker in task_workers:
+            if not worker.is_alive():
+                continue
             try:
-                task_processor_thread.join(timeout=5)
-                if task_processor_thread.is_alive():
+                worker.join(timeout=5)
+                if worker.is_alive():
                     logger.debug(
-                        "Task queue processor thread did not terminate in time. Forcing shutdown.")
+                        f"{worker.name} did not terminate in time. Forcing shutdown.")
             except Exception as e:
                 logger.error(
-                    f"Error during task processor thread shutdown: {e}")
+                    f"Error during task worker shutdown: {e}")
 
-        cleanup_resources(active_timers, task_queue)
+        cleanup_resources(scheduler, task_queue)
+        state_store.close()
 
         # Завершение или перезапуск
         if getattr(stop_event, "restart_mode", False):
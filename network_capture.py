@@ -0,0 +1,239 @@
+import base64
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from selenium.common.exceptions import WebDriverException
+from utils import load_settings
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+# Capability ChromeDriver: журнал производительности с событиями DevTools (Network.*)
+LOGGING_PREFS = {"performance": "ALL"}
+DEFAULT_URL_FILTER = "nutsfarm"
+
+# Ключи ответов API мини-приложения (в нижнем регистре). Схема бэкенда не опубликована,
+# поэтому значения ищутся по именам полей в любом месте JSON.
+BALANCE_KEYS = ("balance",)
+FARM_END_KEYS = ("farmingendsat", "farmendsat", "endsat", "endtime", "finishat", "claimat")
+COMPLETED_KEYS = ("completed", "iscompleted", "done", "isdone", "claimed", "isclaimed", "finished")
+MAX_DEPTH = 6
+
+
+def capture_enabled(settings=None):
+    settings = settings if settings is not None else load_settings()
+    return settings.get("NETWORK_CAPTURE", "true").strip().lower() == "true"
+
+
+def _to_number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        text = value.replace(",", "").strip()
+        if text.replace(".", "", 1).isdigit():
+            return float(text)
+    return None
+
+
+def _to_time(value):
+    """
+    ISO-строка или метка времени (секунды/миллисекунды) -> datetime (UTC) или None.
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        seconds = value / 1000 if value > 1e11 else value
+        try:
+            return datetime.fromtimestamp(seconds, timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            return None
+    if isinstance(value, str):
+        try:
+            moment = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+    return None
+
+
+def _walk(data, path=(), depth=0):
+    """
+    Обходит JSON и выдаёт (путь ключей в нижнем регистре, ключ, значение).
+    Элементы списков отмечаются в пути как "[]".
+    """
+    if depth > MAX_DEPTH:
+        return
+    if isinstance(data, dict):
+        for key, value in data.items():
+            key = str(key).lower()
+            yield path, key, value
+            yield from _walk(value, path + (key,), depth + 1)
+    elif isinstance(data, list):
+        for item in data:
+            yield from _walk(item, path + ("[]",), depth + 1)
+
+
+def extract_state(url, data):
+    """
+    Извлекает из одного JSON-ответа известные значения.
+
+    :return: Словарь с частью ключей balance (float), farm_ends_at (datetime),
+             quests (list[dict]), courses (list[dict]).
+    """
+    url = url.lower()
+    # Окончание фарма ищется только в ответах эндпоинта фарма или в объекте фарма:
+    # домен (nutsfarm) содержит "farm" в любом ответе
+    farm_endpoint = "farm" in urlsplit(url).path
+    found = {}
+    if isinstance(data, list):
+        # Ответ — сам список (например, /quests)
+        for name, marker in (("quests", "quest"), ("quests", "task"), ("courses", "course")):
+            if marker in url and all(isinstance(item, dict) for item in data):
+                found.setdefault(name, data)
+    for path, key, value in _walk(data):
+        # Значения внутри списков (друзья, рейтинг) относятся не к текущему пользователю
+        in_list = "[]" in path
+        if key in BALANCE_KEYS and not in_list and "balance" not in found:
+            number = _to_number(value)
+            if number is not None:
+                found["balance"] = number
+        elif key in FARM_END_KEYS and not in_list and "farm_ends_at" not in found \
+                and (farm_endpoint or any("farm" in part for part in path + (key,))):
+            moment = _to_time(value)
+            if moment is not None:
+                found["farm_ends_at"] = moment
+        elif isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+            if ("quest" in key or "task" in key) and "quests" not in found:
+                found["quests"] = value
+            elif "course" in key and "courses" not in found:
+                found["courses"] = value
+    return found
+
+
+def is_completed(item):
+    """
+    True/False по явному флагу выполнения квеста или курса; None, если флага нет.
+    """
+    for key, value in item.items():
+        if str(key).lower() in COMPLETED_KEYS and isinstance(value, bool):
+            return value
+    return None
+
+
+class NetworkCapture:
+    """
+    Снимает JSON-ответы API мини-приложения из журнала производительности ChromeDriver
+    (события Network.responseReceived / Network.loadingFinished) и тела ответов
+    через Network.getResponseBody.
+
+    Значения (баланс, окончание фарма, списки квестов и курсов) обновляются при каждом
+    опросе журнала; методы бота читают их первыми, а DOM остаётся запасным путём.
+    Запросы iframe из другого процесса (изоляция сайтов) в журнал вкладки могут не
+    попадать — тогда значения просто отсутствуют.
+    """
+    MAX_PENDING = 200
+
+    def __init__(self, driver, url_filter=DEFAULT_URL_FILTER):
+        self.driver = driver
+        self.url_filter = url_filter
+        self._lock = threading.Lock()
+        self._pending = {}  # requestId -> url
+        self._values = {}  # name -> (value, monotonic time)
+        self.available = True
+
+    def poll(self):
+        """
+        Разбирает новые записи журнала. Возвращает число обработанных ответов.
+        """
+        if not self.available:
+            return 0
+        with self._lock:
+            try:
+                entries = self.driver.get_log("performance")
+            except (WebDriverException, ValueError) as e:
+                # Журнал не включён (драйвер создан без goog:loggingPrefs) — не пытаемся снова
+                self.available = False
+                logger.debug(
+                    f"Network capture unavailable: {str(e).splitlines()[0] if str(e) else e}")
+                return 0
+            handled = 0
+            for entry in entries:
+                try:
+                    message = json.loads(entry["message"])["message"]
+                except (KeyError, TypeError, ValueError):
+                    continue
+                method = message.get("method")
+                params = message.get("params", {})
+                if method == "Network.responseReceived":
+                    response = params.get("response", {})
+                    url = response.get("url", "")
+                    if (params.get("type") in ("XHR", "Fetch")
+                            and "json" in (response.get("mimeType") or "")
+                            and self.url_filter in url):
+                        if len(self._pending) >= self.MAX_PENDING:
+                            self._pending.clear()
+                        self._pending[params.get("requestId")] = url
+                elif method == "Network.loadingFinished":
+                    url = self._pending.pop(params.get("requestId"), None)
+                    if url and self._read_body(params.get("requestId"), url):
+                        handled += 1
+                elif method == "Network.loadingFailed":
+                    self._pending.pop(params.get("requestId"), None)
+            return handled
+
+    def _read_body(self, request_id, url):
+        try:
+            result = self.driver.execute_cdp_cmd(
+                "Network.getResponseBody", {"requestId": request_id})
+            body = result.get("body") or "null"
+            if result.get("base64Encoded"):
+                body = base64.b64decode(body).decode("utf-8")
+            data = json.loads(body)
+        except (WebDriverException, ValueError, UnicodeDecodeError) as e:
+            # Тело уже выгружено (навигация) или ответ не JSON
+            logger.debug(
+                f"Network capture: no body for {url}: {str(e).splitlines()[0] if str(e) else e}")
+            return False
+        now = time.monotonic()
+        for name, value in extract_state(url, data).items():
+            self._values[name] = (value, now)
+        return True
+
+    def get(self, name, max_age=None):
+        """
+        Последнее снятое значение (после опроса журнала) или None.
+
+        :param max_age: Не старше N секунд.
+        """
+        self.poll()
+        with self._lock:
+            entry = self._values.get(name)
+        if not entry:
+            return None
+        value, captured_at = entry
+        if max_age is not None and time.monotonic() - captured_at > max_age:
+            return None
+        return value
+
+    def forget(self, name):
+        """
+        Забывает значение, снятое до этого момента: после действия на странице
+        доверяем только ответам, полученным после него.
+        """
+        self.poll()
+        with self._lock:
+            self._values.pop(name, None)
+
+    def reset(self):
+        """
+        Забывает снятые значения и непрочитанные записи журнала (перед новым запуском приложения).
+        """
+        self.poll()
+        with self._lock:
+            self._pending.clear()
+            self._values.clear()
@@ -0,0 +1,447 @@
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import requests
+from requests.adapters import HTTPAdapter
+from utils import load_settings
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+DEFAULT_API_URL = "https://nutsfarm.crypton.xyz/api/v1"
+FARMING_STATES = ("idle", "farming", "claimable")
+
+
+class NutsApiError(Exception):
+    """
+    Запрос к бэкенду NUTS не удался (сеть, HTTP-статус, авторизация).
+    Вызывающий код должен выполнить шаг через Selenium.
+    """
+
+
+class NutsApiSchemaError(NutsApiError):
+    """
+    Ответ бэкенда не соответствует ожидаемой схеме.
+    """
+
+
+def extract_init_data(launch_url):
+    """
+    Достаёт tgWebAppData (initData мини-приложения) из ссылки запуска.
+    Telegram передаёт параметры в hash ссылки; на всякий случай проверяем и query.
+
+    :return: Строка initData или None.
+    """
+    if not launch_url:
+        return None
+    parsed = urlparse(launch_url)
+    for part in (parsed.fragment, parsed.query):
+        values = parse_qs(part).get("tgWebAppData")
+        if values and values[0]:
+            return values[0]
+    return None
+
+
+def _require(data, key, types, allow_none=False):
+    if not isinstance(data, dict):
+        raise NutsApiSchemaError(
+            f"expected an object, got {type(data).__name__}")
+    if key not in data:
+        raise NutsApiSchemaError(f"missing field '{key}'")
+    value = data[key]
+    types = types if isinstance(types, tuple) else (types,)
+    if value is None and allow_none:
+        return None
+    if isinstance(value, bool) and bool not in types:
+        raise NutsApiSchemaError(f"field '{key}' has unexpected type bool")
+    if not isinstance(value, types):
+        raise NutsApiSchemaError(
+            f"field '{key}' has unexpected type {type(value).__name__}")
+    return value
+
+
+def _parse_number(value, key):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise NutsApiSchemaError(f"field '{key}' is not a number: {value!r}")
+
+
+def _parse_time(value, key):
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        raise NutsApiSchemaError(f"field '{key}' is not an ISO time: {value!r}")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+class NutsApiClient:
+    """
+    HTTP-клиент бэкенда NUTS для одного аккаунта.
+
+    Авторизуется по initData, захваченному из ссылки запуска мини-приложения,
+    и выполняет фарм, сбор и чтение баланса без DOM. Любая ошибка сети или
+    несовпадение схемы ответа поднимает NutsApiError — шаг выполняется через Selenium.
+
+    Ожидаемая схема (пути задаются в ENDPOINTS):
+      POST auth           {"initData": str}   -> {"accessToken": str}
+      GET  user           -> {"username": str|null, "balance": number|str}
+      GET  farming        -> {"status": "idle"|"farming"|"claimable", "endsAt": ISO|null}
+      POST farming_start  -> объект farming
+      POST farming_claim  -> {"balance": number|str}
+      POST daily_claim    -> {"claimed": bool}; 409 — награда уже получена
+    """
+    ENDPOINTS = {
+        "auth": "/auth/login/telegram",
+        "user": "/user/current",
+        "farming": "/farming/current",
+        "farming_start": "/farming/start",
+        "farming_claim": "/farming/claim",
+        "daily_claim": "/daily-reward/claim",
+    }
+    TIMEOUT = 15
+
+    def __init__(self, base_url, init_data, session):
+        self.base_url = base_url.rstrip("/")
+        self.init_data = init_data
+        self.session = session
+        self._token = None
+        self._auth_failed = False
+
+    def _request(self, method, name, payload=None, allow_status=(), retried=False):
+        url = f"{self.base_url}{self.ENDPOINTS[name]}"
+        headers = {"Authorization": f"Bearer {self._token}"} if self._token else {}
+        try:
+            response = self.session.request(
+                method, url, json=payload, headers=headers, timeout=self.TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            raise NutsApiError(f"{name}: {e}")
+        if response.status_code in allow_status:
+            return response.status_code, None
+        if response.status_code == 401 and name != "auth" and self._token:
+            self._token = None
+            if retried:
+                # Свежий токен тоже отклонён — дальше через Selenium
+                raise NutsApiError(f"{name}: HTTP 401 after re-login")
+            # Токен истёк — авторизуемся заново один раз
+            self.login()
+            return self._request(method, name, payload, allow_status, retried=True)
+        if response.status_code >= 400:
+            raise NutsApiError(f"{name}: HTTP {response.status_code}")
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            raise NutsApiSchemaError(f"{name}: response is not JSON")
+
+    def login(self):
+        if self._auth_failed:
+            raise NutsApiError("auth: login failed earlier in this run")
+        try:
+            _, data = self._request("POST", "auth", {"initData": self.init_data})
+            self._token = _require(data, "accessToken", str)
+        except NutsApiError:
+            # initData отклонён — больше не пытаемся до следующего запуска
+            self._auth_failed = True
+            raise
+
+    def _call(self, method, name, payload=None, allow_status=()):
+        if not self._token:
+            self.login()
+        return self._request(method, name, payload, allow_status)
+
+    def user(self):
+        """
+        :return: {"username": str|None, "balance": float}
+        """
+        _, data = self._call("GET", "user")
+        username = _require(data, "username", str, allow_none=True)
+        balance = _parse_number(
+            _require(data, "balance", (int, float, str)), "balance")
+        return {"username": username, "balance": balance}
+
+    def farming_status(self):
+        """
+        :return: {"status": одно из FARMING_STATES, "ends_at": datetime|None}
+        """
+        _, data = self._call("GET", "farming")
+        return self._farming(data)
+
+    @staticmethod
+    def _farming(data):
+        status = _require(data, "status", str).lower()
+        if status not in FARMING_STATES:
+            raise NutsApiSchemaError(f"unknown farming status '{status}'")
+        ends_at = _require(data, "endsAt", str, allow_none=True)
+        return {"status": status,
+                "ends_at": _parse_time(ends_at, "endsAt") if ends_at else None}
+
+    def start_farming(self):
+        _, data = self._call("POST", "farming_start")
+        return self._farming(data)
+
+    def claim_farming(self):
+        _, data = self._call("POST", "farming_claim")
+        return _parse_number(_require(data, "balance", (int, float, str)), "balance")
+
+    def claim_daily(self):
+        """
+        :return: True, если награда получена сейчас; False, если уже была получена.
+        """
+        status, data = self._call("POST", "daily_claim", allow_status=(409,))
+        if status == 409:
+            return False
+        return _require(data, "claimed", bool)
+
+    def run_farming(self):
+        """
+        Собирает готовый фарм и запускает новый.
+
+        :return: (действия, итоговое состояние фарма)
+        """
+        state = self.farming_status()
+        actions = []
+        if state["status"] == "claimable":
+            self.claim_farming()
+            actions.append("claimed")
+            state = self.farming_status()
+        if state["status"] == "idle":
+            state = self.start_farming()
+            actions.append("started")
+        return actions, state
+
+
+class NutsApi:
+    """
+    Общая точка входа в HTTP-путь: пул соединений и статистика шагов
+    (сколько раз шаг выполнен через API и сколько раз пришлось вернуться к Selenium).
+    """
+
+    def __init__(self, enabled=False, base_url=DEFAULT_API_URL, pool_size=16):
+        self.enabled = enabled
+        self.base_url = base_url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def client(self, launch_url):
+        """
+        Создаёт клиента аккаунта по ссылке запуска. None, если путь отключён или initData нет.
+        """
+        if not self.enabled:
+            return None
+        init_data = extract_init_data(launch_url)
+        if not init_data:
+            return None
+        return NutsApiClient(self.base_url, init_data, self.session)
+
+    def record(self, step, ok, seconds=0.0):
+        with self._lock:
+            entry = self._stats.setdefault(
+                step, {"api": 0, "fallback": 0, "total": 0.0})
+            if ok:
+                entry["api"] += 1
+                entry["total"] += seconds
+            else:
+                entry["fallback"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                step: {
+                    "api": entry["api"],
+                    "fallback": entry["fallback"],
+                    "avg_ms": round(entry["total"] / entry["api"] * 1000, 1) if entry["api"] else 0.0,
+                }
+                for step, entry in self._stats.items()
+            }
+
+    def close(self):
+        self.session.close()
+
+
+_nuts_api = None
+_nuts_api_lock = threading.Lock()
+
+
+def get_nuts_api():
+    """
+    Возвращает общий HTTP-путь, настроенный из settings.txt (API_FAST_PATH, NUTS_API_URL).
+    """
+    global _nuts_api
+    with _nuts_api_lock:
+        if _nuts_api is None:
+            settings = load_settings()
+            enabled = settings.get(
+                "API_FAST_PATH", "false").strip().lower() == "true"
+            base_url = settings.get("NUTS_API_URL", "").strip() or DEFAULT_API_URL
+            _nuts_api = NutsApi(enabled, base_url)
+            if enabled:
+                logger.debug(f"NUTS API fast path enabled for {base_url}.")
+        return _nuts_api
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """
+    Локальная заглушка бэкенда по схеме NutsApiClient — для проверки HTTP-пути
+    без реального сервера: NUTS_API_URL=http://127.0.0.1:<port>
+    """
+    # broken_schema — ответы не по схеме, reject_tokens — 401 на любой токен
+    DEFAULT_STATE = {"balance": 1000.0, "status": "claimable", "ends_at": None, "daily": True,
+                     "broken_schema": False, "reject_tokens": False}
+    state = dict(DEFAULT_STATE)
+    lock = threading.Lock()
+
+    def _send(self, status, body=None):
+        payload = json.dumps(body if body is not None else {}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _farming(self):
+        ends_at = self.state["ends_at"]
+        if self.state["status"] == "farming" and ends_at and ends_at <= time.time():
+            self.state["status"] = "claimable"
+        return {
+            "status": self.state["status"],
+            "endsAt": datetime.fromtimestamp(ends_at, timezone.utc).isoformat() if ends_at else None,
+        }
+
+    def _authorized(self):
+        return (not self.state["reject_tokens"]
+                and self.headers.get("Authorization") == "Bearer stub-token")
+
+    def do_GET(self):
+        with self.lock:
+            path = urlparse(self.path).path
+            if not self._authorized():
+                return self._send(401)
+            if path.endswith(NutsApiClient.ENDPOINTS["user"]):
+                if self.state["broken_schema"]:
+                    return self._send(200, {"user": {"name": "stub"}, "coins": {"amount": 1}})
+                return self._send(200, {"username": "stub", "balance": self.state["balance"]})
+            if path.endswith(NutsApiClient.ENDPOINTS["farming"]):
+                if self.state["broken_schema"]:
+                    return self._send(200, {"status": "paused", "endsAt": None})
+                return self._send(200, self._farming())
+            return self._send(404)
+
+    def do_POST(self):
+        with self.lock:
+            path = urlparse(self.path).path
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if path.endswith(NutsApiClient.ENDPOINTS["auth"]):
+                if body.get("initData"):
+                    return self._send(200, {"accessToken": "stub-token"})
+                return self._send(401)
+            if not self._authorized():
+                return self._send(401)
+            if path.endswith(NutsApiClient.ENDPOINTS["farming_claim"]):
+                if self.state["status"] != "claimable":
+                    return self._send(400)
+                self.state["balance"] += 100
+                self.state["status"] = "idle"
+                return self._send(200, {"balance": self.state["balance"]})
+            if path.endswith(NutsApiClient.ENDPOINTS["farming_start"]):
+                self.state["status"] = "farming"
+                self.state["ends_at"] = time.time() + 8 * 60 * 60
+                return self._send(200, self._farming())
+            if path.endswith(NutsApiClient.ENDPOINTS["daily_claim"]):
+                if not self.state["daily"]:
+                    return self._send(409)
+                self.state["daily"] = False
+                return self._send(200, {"claimed": True})
+            return self._send(404)
+
+    def log_message(self, format, *args):
+        logger.debug(f"NUTS API stub: {format % args}")
+
+
+def run_stub_server(host="127.0.0.1", port=8765):
+    """
+    Запускает заглушку бэкенда в фоновом потоке и возвращает сервер (server.shutdown() — остановить).
+    Состояние заглушки — server.RequestHandlerClass.state, у каждого сервера своё.
+    """
+    handler = type("StubHandler", (_StubHandler,), {
+        "state": dict(_StubHandler.DEFAULT_STATE), "lock": threading.Lock()})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever,
+                     name="nuts-api-stub", daemon=True).start()
+    return server
+
+
+def _self_test():
+    """
+    Проверка клиента на заглушке: сбор и запуск фарма, ежедневная награда (в том числе 409),
+    несовпадение схемы и повторный 401 — всё должно заканчиваться NutsApiError,
+    по которому бот возвращается к Selenium.
+    """
+    server = run_stub_server(port=0)
+    state = server.RequestHandlerClass.state
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/api/v1"
+    api = NutsApi(True, base_url)
+    try:
+        client = api.client("https://nutsfarm.example/#tgWebAppData=query_id%3Dstub")
+        assert client is not None, "initData not extracted from launch URL"
+
+        actions, farming_state = client.run_farming()
+        assert actions == ["claimed", "started"], actions
+        assert farming_state["status"] == "farming" and farming_state["ends_at"], farming_state
+        assert client.user() == {"username": "stub", "balance": 1100.0}
+        actions, farming_state = client.run_farming()
+        assert actions == [] and farming_state["status"] == "farming", (actions, farming_state)
+
+        assert client.claim_daily() is True
+        assert client.claim_daily() is False, "409 must mean the reward was already claimed"
+
+        state["broken_schema"] = True
+        for step in (client.user, client.farming_status):
+            try:
+                step()
+            except NutsApiSchemaError:
+                pass
+            else:
+                raise AssertionError(f"{step.__name__}: schema mismatch not detected")
+        state["broken_schema"] = False
+
+        state["reject_tokens"] = True
+        try:
+            client.user()
+        except NutsApiError as e:
+            assert "after re-login" in str(e), e
+        else:
+            raise AssertionError("repeated 401 not reported")
+        state["reject_tokens"] = False
+    finally:
+        api.close()
+        server.shutdown()
+    print("NUTS API client self-test passed.")
+
+
+if __name__ == "__main__":
+    # python nuts_api.py [port]    — заглушка бэкенда для проверки API_FAST_PATH
+    # python nuts_api.py --selftest — проверка клиента на заглушке
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "--selftest":
+        _self_test()
+        sys.exit(0)
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    server = run_stub_server(port=port)
+    print(f"NUTS API stub listening on http://127.0.0.1:{port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from adspower_client import get_client
+from utils import load_settings, stop_event
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+DEFAULT_CACHE_FILE = os.path.join("temp", "profiles.json")
+DEFAULT_CACHE_TTL = 3600  # секунд
+DEFAULT_CACHE_MAX_AGE = 24 * 60 * 60  # секунд
+CACHE_MODES = ("ttl", "changed", "off")
+# Поля профиля, которые нужны скрипту; остальное в кэш не пишем
+PROFILE_FIELDS = ("serial_number", "user_id", "name", "group_id", "group_name")
+
+
+class ProfileCatalog:
+    """
+    Каталог профилей AdsPower с кэшем на диске.
+
+    Режимы кэша (PROFILE_CACHE_MODE):
+      ttl     — кэш используется, пока он моложе PROFILE_CACHE_TTL секунд;
+      changed — после истечения TTL сначала загружается только первая страница,
+                и если её отпечаток не изменился (новые профили AdsPower отдаёт первыми),
+                кэш продлевается без полной загрузки, но не дольше PROFILE_CACHE_MAX_AGE
+                секунд с последней полной загрузки (изменения на других страницах
+                первая страница не отражает);
+      off     — профили загружаются каждый раз.
+
+    Страницы загружаются волнами параллельно; частоту запросов ограничивает
+    общий клиент AdsPower, поэтому фиксированные паузы между страницами не нужны.
+    """
+    PAGE_SIZE = 100
+    FETCH_WORKERS = 4
+
+    def __init__(self, client, cache_path=DEFAULT_CACHE_FILE, ttl=DEFAULT_CACHE_TTL,
+                 mode="changed", group_id=None, max_age=DEFAULT_CACHE_MAX_AGE):
+        self.client = client
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.max_age = max_age
+        self.mode = mode if mode in CACHE_MODES else "changed"
+        self.group_id = group_id or None
+        self._lock = threading.Lock()
+        self._cache = None
+
+    def profiles(self, force_refresh=False):
+        """
+        Возвращает список профилей — из кэша, если он актуален, иначе из API.
+        """
+        with self._lock:
+            cache = None if force_refresh or self.mode == "off" else self._load_cache()
+            if cache is not None:
+                age = time.time() - cache["fetched_at"]
+                if age < self.ttl:
+                    logger.debug(
+                        f"Using cached profile catalog ({len(cache['profiles'])} profiles, age {age:.0f}s).")
+                    return list(cache["profiles"])
+                # Кэш старого формата без refreshed_at сразу обновляется полностью
+                full_age = time.time() - cache.get("refreshed_at", 0)
+                if self.mode == "changed" and full_age < self.max_age:
+                    first_page = self._fetch_page(1)
+                    if first_page is not None and self._fingerprint(first_page) == cache["fingerprint"]:
+                        cache["fetched_at"] = time.time()
+                        self._save_cache(cache)
+                        logger.debug(
+                            "Profile catalog unchanged since last refresh. Cache extended.")
+                        return list(cache["profiles"])
+
+            profiles, first_page = self._fetch_all()
+            if profiles is None:
+                # API недоступен — лучше устаревший кэш, чем ничего
+                if cache is not None:
+                    logger.warning(
+                        "Failed to refresh AdsPower profiles. Using stale profile cache.")
+                    return list(cache["profiles"])
+                return []
+
+            now = time.time()
+            cache = {
+                "fetched_at": now,
+                "refreshed_at": now,
+                "group_id": self.group_id,
+                "fingerprint": self._fingerprint(first_page),
+                "profiles": profiles,
+            }
+            if self.mode != "off":
+                self._save_cache(cache)
+            logger.debug(f"Profile catalog refreshed: {len(profiles)} profiles.")
+            return list(profiles)
+
+    def invalidate(self):
+        with self._lock:
+            self._cache = None
+            try:
+                os.remove(self.cache_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.debug(f"Failed to remove profile cache: {e}")
+
+    def _fetch_page(self, page):
+        """
+        Загружает одну страницу. Возвращает список профилей или None при ошибке.
+        """
+        try:
+            data = self.client.user_list(
+                page=page, page_size=self.PAGE_SIZE, group_id=self.group_id)
+        except requests.RequestException as e:
+            logger.debug(f"An error occurred while accessing the API: {e}")
+            return None
+        if data.get("code") != 0:
+            logger.debug(f"API error: {data.get('msg')}")
+            return None
+        return [
+            {field: profile.get(field) for field in PROFILE_FIELDS if field in profile}
+            for profile in data.get("data", {}).get("list", []) or []
+        ]
+
+    def _fetch_all(self):
+        """
+        Загружает все страницы: первую — отдельно, остальные — параллельными волнами,
+        пока не встретится неполная страница.
+
+        :return: (профили, первая страница) или (None, None), если список загружен не полностью
+                 (ошибка страницы или остановка до последней, неполной страницы).
+        """
+        first_page = self._fetch_page(1)
+        if first_page is None:
+            return None, None
+        profiles = list(first_page)
+        if len(first_page) < self.PAGE_SIZE:
+            return profiles, first_page
+
+        next_page = 2
+        finished = False
+        with ThreadPoolExecutor(max_workers=self.FETCH_WORKERS,
+                                thread_name_prefix="profile-fetch") as executor:
+            while not stop_event.is_set():
+                pages = list(range(next_page, next_page + self.FETCH_WORKERS))
+                results = list(executor.map(self._fetch_page, pages))
+                for result in results:
+                    if result is None:
+                        # Ошибка посреди списка — не сохраняем неполный каталог
+                        logger.warning(
+                            "Failed to load a page of AdsPower profiles. Profile list is incomplete.")
+                        return None, None
+                    profiles.extend(result)
+                    if len(result) < self.PAGE_SIZE:
+                        finished = True
+                        break
+                if finished:
+                    break
+                next_page += self.FETCH_WORKERS
+        if not finished:
+            # Остановка посреди списка — неполный каталог не сохраняем
+            logger.debug("Profile list loading interrupted by stop event.")
+            return None, None
+        return profiles, first_page
+
+    @staticmethod
+    def _fingerprint(page):
+        payload = json.dumps(page, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _load_cache(self):
+        if self._cache is not None:
+            cache = self._cache
+        else:
+            if not os.path.exists(self.cache_path):
+                return None
+            try:
+                with open(self.cache_path, "r", encoding="utf-8") as f:
+                    cache = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                logger.debug(f"Failed to read profile cache: {e}")
+                return None
+        if not isinstance(cache, dict) or "profiles" not in cache:
+            return None
+        # Кэш другой группы не подходит
+        if cache.get("group_id") != self.group_id:
+            return None
+        self._cache = cache
+        return cache
+
+    def _save_cache(self, cache):
+        self._cache = cache
+        directory = os.path.dirname(self.cache_path)
+        try:
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            temp_path = self.cache_path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(cache, f, ensure_ascii=False)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            logger.debug(f"Failed to write profile cache: {e}")
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """
+    Возвращает общий каталог профилей, настроенный из settings.txt
+    (PROFILE_CACHE_TTL, PROFILE_CACHE_MAX_AGE, PROFILE_CACHE_MODE, ADSPOWER_GROUP_ID).
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            settings = load_settings()
+            try:
+                ttl = int(settings.get("PROFILE_CACHE_TTL",
+                          DEFAULT_CACHE_TTL) or DEFAULT_CACHE_TTL)
+            except ValueError:
+                logger.warning(
+                    f"Invalid value for 'PROFILE_CACHE_TTL'. Using {DEFAULT_CACHE_TTL}.")
+                ttl = DEFAULT_CACHE_TTL
+            try:
+                max_age = int(settings.get("PROFILE_CACHE_MAX_AGE",
+                              DEFAULT_CACHE_MAX_AGE) or DEFAULT_CACHE_MAX_AGE)
+            except ValueError:
+                logger.warning(
+                    f"Invalid value for 'PROFILE_CACHE_MAX_AGE'. Using {DEFAULT_CACHE_MAX_AGE}.")
+                max_age = DEFAULT_CACHE_MAX_AGE
+            mode = settings.get("PROFILE_CACHE_MODE", "changed").strip().lower()
+            if mode not in CACHE_MODES:
+                logger.warning(
+                    f"Unknown profile cache mode '{mode}'. Using 'changed'.")
+                mode = "changed"
+            group_id = settings.get("ADSPOWER_GROUP_ID", "").strip() or None
+            _catalog = ProfileCatalog(
+                get_client(), ttl=ttl, mode=mode, group_id=group_id, max_age=max_age)
+        return _catalog
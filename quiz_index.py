@@ -0,0 +1,267 @@
+import json
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from rapidfuzz import fuzz, process
+from state_store import get_state_store
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+# Ответы на вопросы курсов (вопрос -> текст кнопки правильного ответа) хранятся в файле,
+# который перечитывается при изменении — новые ответы подхватываются без перезапуска
+DEFAULT_ANSWERS_FILE = "quiz_answers.json"
+RELOAD_CHECK_INTERVAL = 30  # секунд между проверками ответов в хранилище
+
+DEFAULT_THRESHOLD = 70
+MEMO_SIZE = 4096
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text):
+    """
+    Приводит вопрос к виду для сравнения: нижний регистр, одинарные пробелы.
+    """
+    return _SPACES.sub(" ", text).strip().casefold()
+
+
+class QuizIndex:
+    """
+    Индекс вопросов курсов, построенный один раз.
+
+    Сначала ищется точное совпадение нормализованного вопроса (словарь),
+    затем — лучший нечёткий кандидат через rapidfuzz.process.extractOne по заранее
+    нормализованным вопросам (partial_ratio, как раньше в find_best_match).
+    Результаты запоминаются (LRU) и общие для всех потоков: одни и те же вопросы
+    встречаются у всех аккаунтов.
+    """
+
+    def __init__(self, question_answer_map, memo_size=MEMO_SIZE):
+        self._questions = list(question_answer_map.keys())
+        self._answers = [question_answer_map[question] for question in self._questions]
+        self._choices = [normalize(question) for question in self._questions]
+        self._exact = {}
+        for position, choice in enumerate(self._choices):
+            self._exact.setdefault(choice, position)
+        self._match = lru_cache(maxsize=memo_size)(self._match_uncached)
+
+    def __len__(self):
+        return len(self._questions)
+
+    def _match_uncached(self, question, threshold):
+        normalized = normalize(question)
+        position = self._exact.get(normalized)
+        if position is not None:
+            return self._questions[position], self._answers[position], 100.0
+        result = process.extractOne(
+            normalized, self._choices, scorer=fuzz.partial_ratio,
+            processor=None, score_cutoff=threshold)
+        if result is None:
+            return None
+        _, score, position = result
+        return self._questions[position], self._answers[position], score
+
+    def match(self, question, threshold=DEFAULT_THRESHOLD):
+        """
+        :return: (вопрос из базы, ответ, схожесть) или None, если схожесть ниже threshold.
+        """
+        return self._match(question, threshold)
+
+    def answer(self, question, threshold=DEFAULT_THRESHOLD):
+        result = self.match(question, threshold)
+        return result[1] if result else None
+
+    def memo_info(self):
+        return self._match.cache_info()
+
+
+def load_answers(path=DEFAULT_ANSWERS_FILE):
+    """
+    Читает базу ответов из JSON-файла {вопрос: ответ}.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        answers = json.load(f)
+    if not isinstance(answers, dict):
+        raise ValueError("expected an object {question: answer}")
+    return {str(question): str(answer) for question, answer in answers.items()}
+
+
+class QuizKnowledgeBase:
+    """
+    База ответов на вопросы курсов: файл quiz_answers.json плюс ответы из хранилища состояния.
+
+    Индекс перестраивается, когда меняется mtime файла или появляются новые ответы
+    в хранилище. Вопросы без ответа сохраняются в хранилище вместе с показанными
+    вариантами: ответ, добавленный один раз (в файл или через
+    `python quiz_index.py --resolve`), используется всеми аккаунтами. Пока у курса есть
+    вопрос без ответа, курс пропускается, а не проходится заново при каждом запуске.
+    """
+
+    def __init__(self, path=DEFAULT_ANSWERS_FILE, store=None):
+        self.path = path
+        self.store = store or get_state_store()
+        self._lock = threading.Lock()
+        self._index = QuizIndex({})
+        self._file_mtime = None
+        self._file_answers = {}
+        self._learned = {}
+        self._checked_at = 0.0
+
+    def index(self):
+        """
+        Текущий индекс; при изменении файла или хранилища — перестроенный.
+        """
+        with self._lock:
+            changed = False
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                mtime = None
+            if mtime != self._file_mtime:
+                self._file_mtime = mtime
+                try:
+                    self._file_answers = load_answers(self.path) if mtime is not None else {}
+                    logger.debug(
+                        f"Loaded {len(self._file_answers)} quiz answers from {self.path}.")
+                except (OSError, ValueError) as e:
+                    # Ошибка в файле — оставляем прежние ответы
+                    logger.warning(f"Failed to load quiz answers from {self.path}: {e}")
+                changed = True
+            if changed or time.monotonic() - self._checked_at >= RELOAD_CHECK_INTERVAL:
+                self._checked_at = time.monotonic()
+                learned = {
+                    row["text"]: row["answer"] for row in self.store.quiz_questions(resolved=True)}
+                if learned != self._learned:
+                    self._learned = learned
+                    changed = True
+            if changed:
+                answers = dict(self._learned)
+                answers.update(self._file_answers)
+                self._index = QuizIndex(answers)
+            return self._index
+
+    def record_unknown(self, question, options, course=None):
+        """
+        Сохраняет вопрос без ответа и показанные варианты.
+        """
+        options = [option for option in dict.fromkeys(options) if option]
+        self.store.record_quiz_question(normalize(question), question, options, course)
+
+    def resolve(self, question, answer):
+        """
+        Сохраняет ответ на ранее записанный вопрос (по тексту вопроса).
+        """
+        resolved = self.store.resolve_quiz_question(normalize(question), answer)
+        if resolved:
+            with self._lock:
+                self._checked_at = 0.0
+        return resolved
+
+    def blocked_question(self, course, threshold=DEFAULT_THRESHOLD):
+        """
+        Вопрос курса, на который по-прежнему нет ответа, или None, если курс можно проходить.
+        """
+        if not course:
+            return None
+        index = self.index()
+        for row in self.store.quiz_questions(resolved=False, course=course):
+            if index.match(row["text"], threshold) is None:
+                return row["text"]
+        return None
+
+
+_knowledge_base = None
+_knowledge_base_lock = threading.Lock()
+
+
+def get_quiz_knowledge_base():
+    """
+    Возвращает общую базу ответов на вопросы курсов.
+    """
+    global _knowledge_base
+    with _knowledge_base_lock:
+        if _knowledge_base is None:
+            _knowledge_base = QuizKnowledgeBase()
+        return _knowledge_base
+
+
+def _benchmark(size=10000, queries=2000):
+    """
+    Сравнивает прежний перебор с partial_ratio и QuizIndex на базе из size вопросов.
+    """
+    import random
+    import time
+
+    base = list(load_answers().items())
+    scaled = dict(base)
+    number = 0
+    while len(scaled) < size:
+        question, answer = base[number % len(base)]
+        scaled[f"{question} (вариант {number})"] = answer
+        number += 1
+    asked = [random.choice(base)[0] for _ in range(queries)]
+
+    def linear(question):
+        best_match, best_score = None, 0
+        for key in scaled.keys():
+            score = fuzz.partial_ratio(question.lower(), key.lower())
+            if score > best_score:
+                best_score, best_match = score, key
+        return scaled[best_match] if best_score >= DEFAULT_THRESHOLD else None
+
+    sample = asked[:max(1, queries // 100)]
+    started_at = time.perf_counter()
+    for question in sample:
+        linear(question)
+    linear_per_query = (time.perf_counter() - started_at) / len(sample)
+
+    started_at = time.perf_counter()
+    index = QuizIndex(scaled)
+    build_time = time.perf_counter() - started_at
+
+    fuzzy = [question[:-1] + " ?" for question in sample]
+    started_at = time.perf_counter()
+    for question in fuzzy:
+        index.match(question)
+    fuzzy_per_query = (time.perf_counter() - started_at) / len(fuzzy)
+
+    started_at = time.perf_counter()
+    for question in asked:
+        index.match(question)
+    indexed_per_query = (time.perf_counter() - started_at) / len(asked)
+
+    print(f"Questions: {len(scaled)}, queries: {queries}")
+    print(f"Linear partial_ratio scan: {linear_per_query * 1000:.2f} ms/query")
+    print(f"QuizIndex build: {build_time * 1000:.1f} ms")
+    print(f"QuizIndex fuzzy (extractOne): {fuzzy_per_query * 1000:.2f} ms/query")
+    print(f"QuizIndex exact/memoized: {indexed_per_query * 1000:.4f} ms/query")
+    print(f"Memo: {index.memo_info()}")
+
+
+def _print_unknown():
+    questions = get_state_store().quiz_questions(resolved=False)
+    if not questions:
+        print("No unanswered quiz questions.")
+    for row in questions:
+        print(f"[{row['course'] or '?'}] {row['text']} (seen {row['seen']} times)")
+        for option in row["options"]:
+            print(f"    - {option}")
+
+
+if __name__ == "__main__":
+    # python quiz_index.py [size]                    — замер поиска ответов на базе из size вопросов
+    # python quiz_index.py --unknown                 — вопросы без ответа и показанные варианты
+    # python quiz_index.py --resolve "вопрос" "ответ" — сохранить ответ для всех аккаунтов
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "--unknown":
+        _print_unknown()
+    elif len(sys.argv) > 3 and sys.argv[1] == "--resolve":
+        if get_quiz_knowledge_base().resolve(sys.argv[2], sys.argv[3]):
+            print("Answer saved.")
+        else:
+            print("Question not found. Use --unknown to list recorded questions.")
+    else:
+        _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,373 @@
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime
+from queue import Queue
+from utils import AccountId, stop_event
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+
+class DeadlineScheduler:
+    """
+    Планировщик запусков аккаунтов на одном потоке.
+
+    Хранит кучу (heap) дедлайнов и спит до ближайшего из них вместо того,
+    чтобы держать отдельный threading.Timer на каждый аккаунт.
+    Перепланирование и отмена — O(log n): устаревшие записи кучи
+    помечаются как недействительные и пропускаются при извлечении.
+    """
+    # Максимальный сон за один раз. Дедлайны хранятся в "настенном" времени,
+    # поэтому после выхода хоста из сна планировщик догоняет пропущенные запуски
+    # не позже чем через MAX_SLEEP секунд.
+    MAX_SLEEP = 30
+    # Опоздание, после которого запуск считается "догоняющим" (например, после сна хоста)
+    CATCH_UP_THRESHOLD = 60
+
+    def __init__(self, on_due=None):
+        self.on_due = on_due
+        self._heap = []  # (deadline, seq, key)
+        self._entries = {}  # key -> (deadline, seq, payload)
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self._fired = 0
+        self._cancelled = 0
+        self._caught_up = 0
+        self._max_lateness = 0.0
+
+    def start(self, on_due=None):
+        """
+        Запускает поток планировщика.
+
+        :param on_due: Функция on_due(key, payload, deadline), вызываемая при наступлении дедлайна.
+        """
+        if on_due is not None:
+            self.on_due = on_due
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped = False
+        self._thread = threading.Thread(
+            target=self._run, name="deadline-scheduler", daemon=True)
+        self._thread.start()
+        logger.debug("Deadline scheduler started.")
+
+    def stop(self, timeout=5):
+        """
+        Останавливает поток планировщика и очищает все ожидающие запуски.
+        """
+        with self._condition:
+            self._stopped = True
+            self._cancelled += len(self._entries)
+            self._entries.clear()
+            self._heap.clear()
+            self._condition.notify_all()
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+        logger.debug("Deadline scheduler stopped.")
+
+    def schedule(self, key, when, payload=None):
+        """
+        Планирует (или перепланирует) запуск для ключа.
+
+        :param key: Идентификатор аккаунта.
+        :param when: datetime или timestamp времени запуска.
+        :param payload: Произвольные данные, передаваемые в on_due.
+        """
+        deadline = when.timestamp() if isinstance(when, datetime) else float(when)
+        with self._condition:
+            seq = next(self._counter)
+            self._entries[key] = (deadline, seq, payload)
+            heapq.heappush(self._heap, (deadline, seq, key))
+            self._compact()
+            # Будим поток, только если новый дедлайн стал ближайшим
+            if self._heap[0][1] == seq:
+                self._condition.notify()
+
+    def cancel(self, key):
+        """
+        Отменяет запланированный запуск.
+
+        :return: True, если запуск был запланирован.
+        """
+        with self._condition:
+            if self._entries.pop(key, None) is None:
+                return False
+            self._cancelled += 1
+            self._compact()
+            return True
+
+    def is_scheduled(self, key):
+        with self._condition:
+            return key in self._entries
+
+    def pending(self):
+        """
+        Возвращает количество ожидающих запусков.
+        """
+        with self._condition:
+            return len(self._entries)
+
+    def next_deadline(self):
+        """
+        Возвращает datetime ближайшего запуска или None.
+        """
+        with self._condition:
+            self._drop_stale_head()
+            if not self._heap:
+                return None
+            return datetime.fromtimestamp(self._heap[0][0])
+
+    def peek(self):
+        """
+        Возвращает ближайший запуск (key, datetime) без его извлечения или None.
+        """
+        with self._condition:
+            self._drop_stale_head()
+            if not self._heap:
+                return None
+            deadline, _, key = self._heap[0]
+            return key, datetime.fromtimestamp(deadline)
+
+    def stats(self):
+        """
+        Возвращает статистику планировщика.
+        """
+        with self._condition:
+            self._drop_stale_head()
+            next_deadline = datetime.fromtimestamp(
+                self._heap[0][0]) if self._heap else None
+            return {
+                "pending": len(self._entries),
+                "heap_size": len(self._heap),
+                "next_deadline": next_deadline,
+                "fired": self._fired,
+                "cancelled": self._cancelled,
+                "caught_up": self._caught_up,
+                "max_lateness": round(self._max_lateness, 2),
+            }
+
+    def _is_live(self, item):
+        deadline, seq, key = item
+        entry = self._entries.get(key)
+        return entry is not None and entry[1] == seq
+
+    def _drop_stale_head(self):
+        while self._heap and not self._is_live(self._heap[0]):
+            heapq.heappop(self._heap)
+
+    def _compact(self):
+        # Перестраиваем кучу, когда недействительных записей больше половины
+        if len(self._heap) > 2 * len(self._entries) + 16:
+            self._heap = [item for item in self._heap if self._is_live(item)]
+            heapq.heapify(self._heap)
+
+    def _pop_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            item = heapq.heappop(self._heap)
+            if not self._is_live(item):
+                continue
+            deadline, _, key = item
+            _, _, payload = self._entries.pop(key)
+            due.append((key, payload, deadline))
+        return due
+
+    def _run(self):
+        while not stop_event.is_set():
+            with self._condition:
+                if self._stopped:
+                    break
+                self._drop_stale_head()
+                now = time.time()
+                if not self._heap:
+                    self._condition.wait(self.MAX_SLEEP)
+                    continue
+                delay = self._heap[0][0] - now
+                if delay > 0:
+                    self._condition.wait(min(delay, self.MAX_SLEEP))
+                    continue
+                due = self._pop_due(now)
+
+            for key, payload, deadline in due:
+                lateness = time.time() - deadline
+                self._fired += 1
+                self._max_lateness = max(self._max_lateness, lateness)
+                if lateness > self.CATCH_UP_THRESHOLD:
+                    self._caught_up += 1
+                    logger.debug(
+                        f"#{key}: Catching up on a run overdue by {lateness:.0f} seconds.")
+                if stop_event.is_set():
+                    break
+                try:
+                    if self.on_due:
+                        self.on_due(key, payload,
+                                    datetime.fromtimestamp(deadline))
+                except Exception as e:
+                    logger.error(f"#{key}: Error in scheduled task: {e}")
+                    logger.debug("Scheduled task traceback:", exc_info=True)
+
+        logger.debug("Deadline scheduler loop exited.")
+
+
+class PolicyTaskQueue(Queue):
+    """
+    Очередь задач с выбираемой политикой порядка выдачи аккаунтов.
+
+    Политики:
+      fifo — в порядке добавления (прежнее поведение);
+      edf  — earliest deadline first, раньше выдаётся аккаунт с более ранним next_schedule;
+      sjf  — shortest job first, раньше выдаётся аккаунт с меньшей историей длительности запуска.
+
+    Служебные задачи (проверка обновлений, сигнал остановки) всегда выдаются первыми.
+    Для аккаунтов считается опоздание (lateness) — время между дедлайном и выдачей воркеру.
+    Если передано хранилище состояния (store), длительности запусков сохраняются в нём
+    и загружаются при старте, чтобы sjf работал уже в первом цикле после перезапуска.
+    """
+    POLICIES = ("fifo", "edf", "sjf")
+    # Вес последнего запуска в скользящем среднем длительности
+    DURATION_SMOOTHING = 0.3
+
+    def __init__(self, policy="edf", maxsize=0, store=None):
+        policy = (policy or "edf").strip().lower()
+        if policy not in self.POLICIES:
+            logger.warning(
+                f"Unknown task scheduling policy '{policy}'. Using 'edf'.")
+            policy = "edf"
+        self.policy = policy
+        self._counter = itertools.count()
+        self.store = store
+        self._durations = {}
+        if store is not None:
+            try:
+                self._durations = store.get_run_durations()
+            except Exception as e:
+                logger.debug(f"Failed to load run durations: {e}")
+        # Сумма длительностей — среднее для аккаунтов без истории считается за O(1)
+        self._durations_total = sum(self._durations.values())
+        self._stats_lock = threading.Lock()
+        self._lateness_count = 0
+        self._lateness_total = 0.0
+        self._lateness_max = 0.0
+        super().__init__(maxsize)
+
+    # Внутреннее хранилище Queue заменяется кучей: (priority, seq, deadline, task)
+    def _init(self, maxsize):
+        self.queue = []
+
+    def _qsize(self):
+        return len(self.queue)
+
+    def _put(self, item):
+        heapq.heappush(self.queue, item)
+
+    def _get(self):
+        return heapq.heappop(self.queue)
+
+    @staticmethod
+    def is_account_task(task):
+        return isinstance(task, tuple) and len(task) == 3
+
+    def put(self, task, block=True, timeout=None, deadline=None):
+        """
+        Добавляет задачу в очередь.
+
+        :param deadline: datetime, к которому аккаунт должен быть обработан (по умолчанию — сейчас).
+        """
+        if self.is_account_task(task):
+            deadline_ts = (deadline.timestamp() if isinstance(deadline, datetime)
+                           else time.time())
+            priority = (1, self._priority(task[0], deadline_ts))
+        else:
+            deadline_ts = None
+            priority = (0, 0)
+        super().put((priority, next(self._counter), deadline_ts, task),
+                    block, timeout)
+
+    def get(self, block=True, timeout=None):
+        _, _, deadline_ts, task = super().get(block, timeout)
+        if deadline_ts is not None:
+            lateness = max(0.0, time.time() - deadline_ts)
+            with self._stats_lock:
+                self._lateness_count += 1
+                self._lateness_total += lateness
+                self._lateness_max = max(self._lateness_max, lateness)
+        return task
+
+    def _priority(self, account, deadline_ts):
+        if self.policy == "edf":
+            return deadline_ts
+        if self.policy == "sjf":
+            return self.expected_duration(account)
+        return 0
+
+    def tasks(self):
+        """
+        Возвращает снимок задач в порядке выдачи.
+        """
+        with self.mutex:
+            return [item[3] for item in sorted(self.queue)]
+
+    def peek(self):
+        """
+        Возвращает следующую задачу аккаунта (task, deadline) без извлечения или None.
+        Служебные задачи пропускаются.
+        """
+        with self.mutex:
+            for _, _, deadline_ts, task in sorted(self.queue):
+                if self.is_account_task(task):
+                    deadline = (datetime.fromtimestamp(deadline_ts)
+                                if deadline_ts is not None else None)
+                    return task, deadline
+        return None
+
+    def record_duration(self, account, seconds):
+        """
+        Запоминает длительность обработки аккаунта (для политики sjf).
+        """
+        account = AccountId(account)
+        with self._stats_lock:
+            previous = self._durations.get(account)
+            if previous is None:
+                duration = seconds
+            else:
+                duration = previous + self.DURATION_SMOOTHING * (seconds - previous)
+            self._durations[account] = duration
+            self._durations_total += duration - (previous or 0.0)
+        if self.store is not None:
+            try:
+                self.store.set_run_duration(account, duration)
+            except Exception as e:
+                logger.debug(f"#{account}: Failed to save run duration: {e}")
+
+    def expected_duration(self, account):
+        """
+        Ожидаемая длительность обработки аккаунта. Для аккаунтов без истории
+        используется среднее по всем известным аккаунтам.
+        """
+        account = AccountId(account)
+        with self._stats_lock:
+            if account in self._durations:
+                return self._durations[account]
+            if self._durations:
+                return self._durations_total / len(self._durations)
+            return 0.0
+
+    def stats(self):
+        """
+        Возвращает статистику опозданий по выданным аккаунтам.
+        """
+        with self._stats_lock:
+            average = (self._lateness_total / self._lateness_count
+                       if self._lateness_count else 0.0)
+            return {
+                "policy": self.policy,
+                "queued": self.qsize(),
+                "dispatched": self._lateness_count,
+                "avg_lateness": round(average, 2),
+                "max_lateness": round(self._lateness_max, 2),
+            }
@@ -0,0 +1,577 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from types import MappingProxyType
+from utils import AccountId
+import logging
+
+# Настройка логирования
+logger = logging.getLogger("application_logger")
+
+DEFAULT_STATE_DB = os.path.join("temp", "state.db")
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class StateStore:
+    """
+    Хранилище состояния аккаунтов на SQLite в режиме WAL.
+
+    Каждое изменение — upsert одной строки, а не перезапись всего timers.json.
+    Индекс по next_schedule позволяет быстро выбирать аккаунты, которым пора запускаться.
+    Каждый поток работает через собственное соединение, поэтому читатели не блокируют писателей.
+    """
+    ACCOUNT_FIELDS = ("username", "balance", "next_schedule", "status")
+
+    def __init__(self, path=DEFAULT_STATE_DB):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._init_schema()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _init_schema(self):
+        connection = self._connection()
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS accounts (
+                account TEXT PRIMARY KEY,
+                username TEXT NOT NULL DEFAULT 'N/A',
+                balance REAL NOT NULL DEFAULT 0,
+                next_schedule TEXT,
+                status TEXT NOT NULL DEFAULT 'N/A',
+                updated_at TEXT NOT NULL
+            )
+        """)
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_accounts_next_schedule ON accounts(next_schedule)")
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS run_durations (
+                account TEXT PRIMARY KEY,
+                seconds REAL NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS launch_urls (
+                account TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                captured_at TEXT NOT NULL
+            )
+        """)
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS cache_state (
+                account TEXT PRIMARY KEY,
+                cleared_at TEXT NOT NULL,
+                runs_since_clear INTEGER NOT NULL DEFAULT 0,
+                stale_reason TEXT,
+                cold_loads INTEGER NOT NULL DEFAULT 0,
+                cold_seconds REAL NOT NULL DEFAULT 0,
+                warm_loads INTEGER NOT NULL DEFAULT 0,
+                warm_seconds REAL NOT NULL DEFAULT 0
+            )
+        """)
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS quiz_questions (
+                question TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                options TEXT NOT NULL DEFAULT '[]',
+                course TEXT,
+                answer TEXT,
+                seen INTEGER NOT NULL DEFAULT 0,
+                first_seen TEXT NOT NULL,
+                last_seen TEXT NOT NULL
+            )
+        """)
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS account_progress (
+                account TEXT PRIMARY KEY,
+                quests_checked_at TEXT,
+                courses_checked_at TEXT
+            )
+        """)
+
+    @staticmethod
+    def _row_to_dict(row):
+        return {
+            "username": row["username"],
+            "balance": row["balance"],
+            "next_schedule": row["next_schedule"],
+            "status": row["status"],
+        }
+
+    def upsert(self, account, **fields):
+        """
+        Создаёт или обновляет строку аккаунта. Обновляются только переданные поля.
+        """
+        fields = {key: value for key, value in fields.items()
+                  if key in self.ACCOUNT_FIELDS}
+        if isinstance(fields.get("next_schedule"), datetime):
+            fields["next_schedule"] = fields["next_schedule"].strftime(
+                TIME_FORMAT)
+        columns = ["account", *fields.keys(), "updated_at"]
+        values = [str(AccountId(account)), *fields.values(),
+                  datetime.now().strftime(TIME_FORMAT)]
+        assignments = ", ".join(
+            f"{column} = excluded.{column}" for column in columns[1:])
+        self._connection().execute(
+            f"INSERT INTO accounts ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)}) "
+            f"ON CONFLICT(account) DO UPDATE SET {assignments}",
+            values
+        )
+
+    def delete(self, account):
+        self._connection().execute(
+            "DELETE FROM accounts WHERE account = ?", (str(AccountId(account)),))
+
+    def write_batch(self, rows, deleted=()):
+        """
+        Атомарно записывает пачку изменений одной транзакцией.
+
+        :param rows: Словарь {account: поля аккаунта} для upsert.
+        :param deleted: Аккаунты, которые нужно удалить.
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for account, fields in rows.items():
+                self.upsert(account, **fields)
+            for account in deleted:
+                self.delete(account)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def get(self, account):
+        """
+        Возвращает данные аккаунта или None.
+        """
+        row = self._connection().execute(
+            "SELECT * FROM accounts WHERE account = ?", (str(AccountId(account)),)).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def snapshot(self, scheduled_after=None):
+        """
+        Возвращает неизменяемый снимок состояния аккаунтов (для вывода таблиц).
+
+        :param scheduled_after: Если задан datetime — только аккаунты с next_schedule позже него.
+        """
+        if scheduled_after is None:
+            rows = self._connection().execute(
+                "SELECT * FROM accounts ORDER BY next_schedule").fetchall()
+        else:
+            rows = self._connection().execute(
+                "SELECT * FROM accounts WHERE next_schedule > ? ORDER BY next_schedule",
+                (scheduled_after.strftime(TIME_FORMAT),)).fetchall()
+        return MappingProxyType({
+            AccountId(row["account"]): MappingProxyType(self._row_to_dict(row)) for row in rows
+        })
+
+    def due_before(self, moment):
+        """
+        Возвращает аккаунты, время запуска которых наступило к моменту moment.
+
+        :return: Словарь {account: datetime next_schedule}, упорядоченный по времени.
+        """
+        rows = self._connection().execute(
+            "SELECT account, next_schedule FROM accounts "
+            "WHERE next_schedule IS NOT NULL AND next_schedule <= ? ORDER BY next_schedule",
+            (moment.strftime(TIME_FORMAT),)).fetchall()
+        return {
+            AccountId(row["account"]): datetime.strptime(row["next_schedule"], TIME_FORMAT)
+            for row in rows
+        }
+
+    def count(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM accounts").fetchone()[0]
+
+    def get_run_durations(self):
+        """
+        Сглаженные длительности запусков аккаунтов (для политики sjf): {account: seconds}.
+        """
+        rows = self._connection().execute(
+            "SELECT account, seconds FROM run_durations").fetchall()
+        return {row["account"]: row["seconds"] for row in rows}
+
+    def set_run_duration(self, account, seconds):
+        self._connection().execute(
+            "INSERT INTO run_durations (account, seconds, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(account) DO UPDATE SET seconds = excluded.seconds, updated_at = excluded.updated_at",
+            (str(AccountId(account)), seconds, datetime.now().strftime(TIME_FORMAT)))
+
+    def get_launch_url(self, account):
+        """
+        Возвращает сохранённую ссылку запуска мини-приложения (с tgWebAppData).
+
+        :return: (url, datetime captured_at) или None.
+        """
+        row = self._connection().execute(
+            "SELECT url, captured_at FROM launch_urls WHERE account = ?",
+            (str(AccountId(account)),)).fetchone()
+        if not row:
+            return None
+        return row["url"], datetime.strptime(row["captured_at"], TIME_FORMAT)
+
+    def set_launch_url(self, account, url):
+        self._connection().execute(
+            "INSERT INTO launch_urls (account, url, captured_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(account) DO UPDATE SET url = excluded.url, captured_at = excluded.captured_at",
+            (str(AccountId(account)), url, datetime.now().strftime(TIME_FORMAT)))
+
+    def delete_launch_url(self, account):
+        self._connection().execute(
+            "DELETE FROM launch_urls WHERE account = ?", (str(AccountId(account)),))
+
+    CACHE_STATE_FIELDS = ("cleared_at", "runs_since_clear", "stale_reason",
+                          "cold_loads", "cold_seconds", "warm_loads", "warm_seconds")
+
+    def get_cache_state(self, account):
+        """
+        Состояние кэша браузера аккаунта (см. cache_policy): cleared_at — datetime,
+        остальные поля как в таблице. None, если записи нет.
+        """
+        row = self._connection().execute(
+            "SELECT * FROM cache_state WHERE account = ?",
+            (str(AccountId(account)),)).fetchone()
+        return self._cache_state_from_row(row) if row else None
+
+    def _cache_state_from_row(self, row):
+        state = {field: row[field] for field in self.CACHE_STATE_FIELDS}
+        state["cleared_at"] = datetime.strptime(row["cleared_at"], TIME_FORMAT)
+        return state
+
+    def set_cache_state(self, account, state):
+        values = dict(state)
+        values["cleared_at"] = values["cleared_at"].strftime(TIME_FORMAT)
+        columns = ", ".join(("account",) + self.CACHE_STATE_FIELDS)
+        placeholders = ", ".join("?" * (len(self.CACHE_STATE_FIELDS) + 1))
+        updates = ", ".join(
+            f"{field} = excluded.{field}" for field in self.CACHE_STATE_FIELDS)
+        self._connection().execute(
+            f"INSERT INTO cache_state ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT(account) DO UPDATE SET {updates}",
+            (str(AccountId(account)),) + tuple(values[field] for field in self.CACHE_STATE_FIELDS))
+
+    def cache_states(self):
+        """
+        Состояние кэша всех аккаунтов: {account: state}.
+        """
+        rows = self._connection().execute("SELECT * FROM cache_state").fetchall()
+        return {row["account"]: self._cache_state_from_row(row) for row in rows}
+
+    def record_quiz_question(self, question, text, options, course):
+        """
+        Сохраняет вопрос курса, на который не нашёлся ответ, и показанные варианты.
+
+        :param question: Нормализованный текст вопроса (ключ).
+        """
+        now = datetime.now().strftime(TIME_FORMAT)
+        self._connection().execute(
+            "INSERT INTO quiz_questions (question, text, options, course, seen, first_seen, last_seen) "
+            "VALUES (?, ?, ?, ?, 1, ?, ?) "
+            "ON CONFLICT(question) DO UPDATE SET text = excluded.text, options = excluded.options, "
+            "course = COALESCE(excluded.course, quiz_questions.course), "
+            "seen = quiz_questions.seen + 1, last_seen = excluded.last_seen",
+            (question, text, json.dumps(options, ensure_ascii=False), course, now, now))
+
+    def resolve_quiz_question(self, question, answer):
+        """
+        Сохраняет ответ на вопрос. :return: False, если такого вопроса нет.
+        """
+        cursor = self._connection().execute(
+            "UPDATE quiz_questions SET answer = ? WHERE question = ?", (answer, question))
+        return cursor.rowcount > 0
+
+    def quiz_questions(self, resolved=None, course=None):
+        """
+        Сохранённые вопросы курсов.
+
+        :param resolved: True — только с ответом, False — только без ответа, None — все.
+        :param course: Только вопросы этого курса.
+        """
+        query = "SELECT * FROM quiz_questions WHERE 1 = 1"
+        params = []
+        if resolved is not None:
+            query += " AND answer IS NOT NULL" if resolved else " AND answer IS NULL"
+        if course is not None:
+            query += " AND course = ?"
+            params.append(course)
+        rows = self._connection().execute(query + " ORDER BY last_seen DESC", params).fetchall()
+        return [
+            {
+                "question": row["question"],
+                "text": row["text"],
+                "options": json.loads(row["options"]),
+                "course": row["course"],
+                "answer": row["answer"],
+                "seen": row["seen"],
+                "last_seen": datetime.strptime(row["last_seen"], TIME_FORMAT),
+            }
+            for row in rows
+        ]
+
+    PROGRESS_FIELDS = ("quests_checked_at", "courses_checked_at")
+
+    def get_progress(self, account):
+        """
+        Прогресс аккаунта: время последней проверки квестов и курсов, после которой
+        нового в них не было (datetime или None).
+        """
+        row = self._connection().execute(
+            "SELECT quests_checked_at, courses_checked_at FROM account_progress WHERE account = ?",
+            (str(AccountId(account)),)).fetchone()
+        return {
+            field: datetime.strptime(row[field], TIME_FORMAT) if row and row[field] else None
+            for field in self.PROGRESS_FIELDS
+        }
+
+    def set_progress(self, account, progress):
+        values = tuple(progress[field].strftime(TIME_FORMAT) if progress.get(field) else None
+                       for field in self.PROGRESS_FIELDS)
+        self._connection().execute(
+            "INSERT INTO account_progress (account, quests_checked_at, courses_checked_at) "
+            "VALUES (?, ?, ?) "
+            "ON CONFLICT(account) DO UPDATE SET quests_checked_at = excluded.quests_checked_at, "
+            "courses_checked_at = excluded.courses_checked_at",
+            (str(AccountId(account)),) + values)
+
+    def migrate_from_json(self, json_path):
+        """
+        Переносит данные из старого timers.json при первом запуске.
+        После успешного переноса файл переименовывается в *.migrated.
+        """
+        if not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, "r") as f:
+                timers = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            logger.error(
+                f"Failed to read timers file '{json_path}' for migration: {e}")
+            return 0
+
+        migrated = 0
+        connection = self._connection()
+        connection.execute("BEGIN")
+        try:
+            for account, data in timers.items():
+                if not isinstance(data, dict):
+                    continue
+                self.upsert(account, **data)
+                migrated += 1
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+        os.replace(json_path, json_path + ".migrated")
+        logger.info(
+            f"Migrated {migrated} timers from '{json_path}' to '{self.path}'.")
+        return migrated
+
+    def close(self):
+        """
+        Закрывает все соединения с базой.
+        """
+        with self._connections_lock:
+            for connection in self._connections:
+                try:
+                    connection.close()
+                except Exception as e:
+                    logger.debug(f"Error closing state store connection: {e}")
+            self._connections.clear()
+        self._local = threading.local()
+
+
+class AccountStateCache:
+    """
+    Кэш состояния аккаунтов в памяти с отложенной записью (write-behind).
+
+    Кэш — основной источник данных: чтения и изменения не обращаются к диску.
+    Изменённые аккаунты помечаются как "грязные", а фоновый поток сбрасывает их
+    в StateStore одной транзакцией раз в flush_interval секунд или сразу после
+    max_pending изменений. Повторные изменения одного аккаунта между сбросами
+    сливаются в одну запись. Интерфейс совпадает с StateStore.
+    """
+
+    def __init__(self, store, flush_interval=5, max_pending=50):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._dirty = set()
+        self._deleted = set()
+        self._stopped = False
+        self._flushes = 0
+        self._flushed_changes = 0
+        self._data = {
+            account: dict(fields) for account, fields in store.snapshot().items()
+        }
+        self._thread = threading.Thread(
+            target=self._run, name="state-flusher", daemon=True)
+        self._thread.start()
+
+    def upsert(self, account, **fields):
+        fields = {key: value for key, value in fields.items()
+                  if key in StateStore.ACCOUNT_FIELDS}
+        if isinstance(fields.get("next_schedule"), datetime):
+            fields["next_schedule"] = fields["next_schedule"].strftime(
+                TIME_FORMAT)
+        account = AccountId(account)
+        with self._condition:
+            row = self._data.setdefault(account, {
+                "username": "N/A", "balance": 0.0, "next_schedule": None, "status": "N/A"})
+            row.update(fields)
+            self._deleted.discard(account)
+            self._dirty.add(account)
+            if len(self._dirty) + len(self._deleted) >= self.max_pending:
+                self._condition.notify()
+
+    def delete(self, account):
+        account = AccountId(account)
+        with self._condition:
+            if self._data.pop(account, None) is None:
+                return
+            self._dirty.discard(account)
+            self._deleted.add(account)
+            if len(self._dirty) + len(self._deleted) >= self.max_pending:
+                self._condition.notify()
+
+    def get(self, account):
+        with self._condition:
+            row = self._data.get(AccountId(account))
+            return dict(row) if row else None
+
+    def snapshot(self, scheduled_after=None):
+        threshold = scheduled_after.strftime(
+            TIME_FORMAT) if scheduled_after else None
+        with self._condition:
+            rows = [
+                (account, dict(row)) for account, row in self._data.items()
+                if threshold is None or (row["next_schedule"] and row["next_schedule"] > threshold)
+            ]
+        rows.sort(key=lambda item: item[1]["next_schedule"] or "")
+        return MappingProxyType({
+            account: MappingProxyType(row) for account, row in rows
+        })
+
+    def due_before(self, moment):
+        threshold = moment.strftime(TIME_FORMAT)
+        with self._condition:
+            due = [
+                (row["next_schedule"], account) for account, row in self._data.items()
+                if row["next_schedule"] and row["next_schedule"] <= threshold
+            ]
+        due.sort()
+        return {
+            account: datetime.strptime(next_schedule, TIME_FORMAT)
+            for next_schedule, account in due
+        }
+
+    def count(self):
+        with self._condition:
+            return len(self._data)
+
+    def pending_changes(self):
+        with self._condition:
+            return len(self._dirty) + len(self._deleted)
+
+    def stats(self):
+        with self._condition:
+            return {
+                "accounts": len(self._data),
+                "pending": len(self._dirty) + len(self._deleted),
+                "flushes": self._flushes,
+                "flushed_changes": self._flushed_changes,
+            }
+
+    def flush(self):
+        """
+        Сбрасывает накопленные изменения в хранилище одной транзакцией.
+
+        :return: Количество записанных изменений.
+        """
+        with self._flush_lock:
+            with self._condition:
+                if not self._dirty and not self._deleted:
+                    return 0
+                rows = {account: dict(self._data[account])
+                        for account in self._dirty}
+                deleted = set(self._deleted)
+                self._dirty.clear()
+                self._deleted.clear()
+            try:
+                self.store.write_batch(rows, deleted)
+            except Exception as e:
+                # Возвращаем изменения в очередь, если их не перезаписали новее
+                with self._condition:
+                    for account in rows:
+                        if account in self._data:
+                            self._dirty.add(account)
+                    self._deleted.update(
+                        account for account in deleted if account not in self._data)
+                logger.error(f"Failed to flush account state: {e}")
+                return 0
+            with self._condition:
+                self._flushes += 1
+                self._flushed_changes += len(rows) + len(deleted)
+            logger.debug(
+                f"Flushed {len(rows)} updated and {len(deleted)} removed accounts to state store.")
+            return len(rows) + len(deleted)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._stopped:
+                    break
+                if len(self._dirty) + len(self._deleted) < self.max_pending:
+                    self._condition.wait(self.flush_interval)
+                if self._stopped:
+                    break
+            self.flush()
+
+    def close(self):
+        """
+        Останавливает фоновый поток и выполняет финальный сброс изменений.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.flush()
+
+
+_state_store = None
+_state_store_lock = threading.Lock()
+
+
+def get_state_store(path=DEFAULT_STATE_DB):
+    """
+    Возвращает общий экземпляр хранилища состояния.
+    """
+    global _state_store
+    with _state_store_lock:
+        if _state_store is None:
+            _state_store = StateStore(path)
+        return _state_store
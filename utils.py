@@ -7,7 +7,6 @@ import atexit
 import sys
 import re
 import ctypes
-import requests
 import importlib
 import time
 import glob
@@ -310,13 +309,114 @@ logger = setup_logger(debug_mode=False, log_dir="./log")
 balances = []
 
 
+class AccountId(str):
+    """
+    Канонический идентификатор аккаунта (серийный номер профиля AdsPower).
+
+    Номера приходят как int (settings.txt), как строки (accounts.txt, timers, SQLite)
+    и в виде, который возвращает AdsPower. AccountId приводит их к одной строке
+    ("007", 7 и " 7 " -> "7"), а так как это подкласс str, он совпадает по хэшу и
+    равенству с обычной строкой и может использоваться как ключ словаря напрямую.
+    """
+    __slots__ = ()
+
+    def __new__(cls, value):
+        if isinstance(value, AccountId):
+            return value
+        if isinstance(value, bool):
+            raise ValueError(f"Invalid account id: {value!r}")
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        text = str(value).strip()
+        if text.isdigit():
+            text = str(int(text))
+        if not text:
+            raise ValueError("Empty account id")
+        return super().__new__(cls, text)
+
+    def sort_key(self):
+        """
+        Ключ сортировки: числовые номера по значению, остальные — по алфавиту после них.
+        """
+        return (0, int(self), "") if self.isdigit() else (1, 0, str(self))
+
+
+class AccountIndex:
+    """
+    Реестр известных аккаунтов с O(1) поиском по любому представлению номера.
+    Хранит единственный экземпляр AccountId на аккаунт и данные профиля AdsPower (если есть).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._accounts = {}
+        self._profiles = {}
+
+    def add(self, value, profile=None):
+        account = AccountId(value)
+        with self._lock:
+            account = self._accounts.setdefault(account, account)
+            if profile is not None:
+                self._profiles[account] = profile
+        return account
+
+    def get(self, value):
+        try:
+            account = AccountId(value)
+        except ValueError:
+            return None
+        with self._lock:
+            return self._accounts.get(account)
+
+    def __contains__(self, value):
+        return self.get(value) is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._accounts)
+
+    def profile(self, value):
+        """
+        Возвращает данные профиля AdsPower для аккаунта или None.
+        """
+        account = self.get(value)
+        if account is None:
+            return None
+        with self._lock:
+            return self._profiles.get(account)
+
+
+# Общий реестр аккаунтов для всех источников
+account_index = AccountIndex()
+
+
+def to_account_ids(values):
+    """
+    Приводит номера аккаунтов к AccountId, регистрирует их в реестре,
+    отбрасывает некорректные и дубликаты (с сохранением порядка).
+    """
+    accounts = []
+    seen = set()
+    for value in values:
+        try:
+            account = account_index.add(value)
+        except ValueError:
+            logger.debug(f"Invalid account id '{value}' skipped.")
+            continue
+        if account not in seen:
+            seen.add(account)
+            accounts.append(account)
+    return accounts
+
+
 def read_accounts_from_file():
     """
     Reads accounts from the 'accounts.txt' file.
     """
     try:
         with open('accounts.txt', 'r') as file:
-            accounts = [line.strip() for line in file if line.strip()]
+            accounts = to_account_ids(
+                line.strip() for line in file if line.strip())
             logger.debug(
                 f"Successfully read {len(accounts)} accounts from accounts.txt.")
             return accounts
@@ -354,41 +454,16 @@ def parse_accounts_parameter(accounts_param):
             except ValueError:
                 logger.debug(
                     f"Invalid account number '{part}' in the accounts parameter.")
-    return sorted(accounts_set)
+    return sorted(to_account_ids(accounts_set), key=AccountId.sort_key)
 
 
 def get_all_profiles():
     """
-    Retrieves all profiles via the AdsPower local API.
+    Retrieves all profiles via the AdsPower local API (through the cached profile catalog).
     """
-    url = "http://localhost:50325/api/v1/user/list"
-    page = 1
-    profiles = []
-
-    while True:
-        params = {"page": page, "page_size": 100}
-        try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-
-            data = response.json()
-            if data.get("code") != 0:
-                logger.debug(f"API error: {data.get('msg')}")
-                break
-
-            current_profiles = data["data"]["list"]
-            if not current_profiles:
-                break
-
-            profiles.extend(current_profiles)
-            page += 1
-
-            stop_event.wait(1)
-        except requests.RequestException as e:
-            logger.debug(f"An error occurred while accessing the API: {e}")
-            break
+    from profile_catalog import get_catalog
 
-    return profiles
+    return get_catalog().profiles()
 
 
 def get_accounts():
@@ -420,8 +495,9 @@ def get_accounts():
     # Retrieve all profiles
     profiles = get_all_profiles()
     if profiles:
-        accounts_from_profiles = [profile['serial_number']
-                                  for profile in profiles]
+        accounts_from_profiles = [
+            account_index.add(profile['serial_number'], profile)
+            for profile in profiles if str(profile.get('serial_number', '')).strip()]
         logger.info(f"Accounts retrieved from ADS profiles")
         logger.debug(f"{accounts_from_profiles}")
         return accounts_from_profiles